@@ -50,18 +50,20 @@ class ActivityAdmin(admin.ModelAdmin):
 class DailyGridAdmin(admin.ModelAdmin):
     """Admin configuration for DailyGrid model."""
     
-    list_display = ('user', 'date', 'grid_size', 'completion_percentage', 'created_at')
+    list_display = ('user', 'date', 'grid_size', 'completion_percentage', 'logged_activities', 'created_at')
     list_filter = ('date', 'grid_size', 'created_at')
     search_fields = ('user__username', 'user__email', 'notes')
     ordering = ('-date',)
-    readonly_fields = ('created_at', 'updated_at', 'completion_percentage')
+    readonly_fields = (
+        'created_at', 'updated_at', 'activities_logged', 'logged_activities', 'completion_percentage'
+    )
     
     fieldsets = (
         (None, {
             'fields': ('user', 'date', 'grid_size')
         }),
         ('Content', {
-            'fields': ('activities_logged', 'notes')
+            'fields': ('activities_logged', 'logged_activities', 'notes')
         }),
         ('Statistics', {
             'fields': ('completion_percentage',)
@@ -71,6 +73,15 @@ class DailyGridAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+    
+    def get_queryset(self, request):
+        # Resolve every listed grid's activities with one query
+        return super().get_queryset(request).select_related('user').with_activities()
+    
+    @admin.display(description='Activities')
+    def logged_activities(self, obj):
+        activities = obj.activities_by_position()
+        return ', '.join(f'{position}: {activity.name}' for position, activity in sorted(activities.items()))
 
 
 @admin.register(ActivityLog)
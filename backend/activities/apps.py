@@ -8,4 +8,10 @@ from django.apps import AppConfig
 class ActivitiesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'activities'
-    verbose_name = 'Activities' 
\ No newline at end of file
+    verbose_name = 'Activities'
+    
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from . import signals
+        
+        post_migrate.connect(signals.compact_legacy_grids, sender=self)
@@ -0,0 +1,151 @@
+"""
+Compact day bitmaps for activity history.
+
+Bit ``i`` of a bitmap is set when something was logged on epoch day
+``offset + i``, so a year of history fits in 46 bytes and streak or range
+questions become integer bit operations.
+"""
+
+from datetime import date, timedelta
+
+EPOCH = date(1970, 1, 1)
+
+
+def epoch_day(value):
+    """Return the number of days between the epoch and a date."""
+    return (value - EPOCH).days
+
+
+def from_epoch_day(day):
+    """Return the date for an epoch day number."""
+    return EPOCH + timedelta(days=day)
+
+
+class DayBitmap:
+    """
+    A growable bitmap of active days.
+
+    ``offset`` is always a multiple of eight so growing towards older dates
+    only prepends whole bytes.
+    """
+    __slots__ = ('offset', 'bits')
+
+    def __init__(self, offset=0, bits=b''):
+        self.offset = offset
+        self.bits = bytearray(bits)
+
+    @classmethod
+    def from_dates(cls, dates):
+        """Build a bitmap from an iterable of dates."""
+        bitmap = cls()
+        for value in dates:
+            bitmap.add(value)
+        return bitmap
+
+    def __contains__(self, value):
+        index = epoch_day(value) - self.offset
+        if index < 0 or index >= len(self.bits) * 8:
+            return False
+        return bool(self.bits[index // 8] & (1 << (index % 8)))
+
+    def __len__(self):
+        return self._as_int().bit_count()
+
+    def __eq__(self, other):
+        if not isinstance(other, DayBitmap):
+            return NotImplemented
+        return sorted(self.dates()) == sorted(other.dates())
+
+    def _as_int(self):
+        return int.from_bytes(self.bits, 'little')
+
+    def add(self, value):
+        """Mark a date as active."""
+        day = epoch_day(value)
+        if not self.bits:
+            self.offset = day - day % 8
+        elif day < self.offset:
+            new_offset = day - day % 8
+            self.bits[0:0] = bytes((self.offset - new_offset) // 8)
+            self.offset = new_offset
+
+        index = day - self.offset
+        byte = index // 8
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(byte - len(self.bits) + 1))
+        self.bits[byte] |= 1 << (index % 8)
+
+    def discard(self, value):
+        """Mark a date as inactive."""
+        if value not in self:
+            return
+        index = epoch_day(value) - self.offset
+        self.bits[index // 8] &= ~(1 << (index % 8)) & 0xFF
+
+        # Keep the bitmap trimmed at both ends
+        while self.bits and not self.bits[-1]:
+            self.bits.pop()
+        while self.bits and not self.bits[0]:
+            del self.bits[0]
+            self.offset += 8
+        if not self.bits:
+            self.offset = 0
+
+    def dates(self):
+        """Yield the active dates in ascending order."""
+        value = self._as_int()
+        while value:
+            lowest = value & -value
+            yield from_epoch_day(self.offset + lowest.bit_length() - 1)
+            value ^= lowest
+
+    def _window(self, start, end):
+        """Return ``(bits, length)`` for the inclusive date range."""
+        low = epoch_day(start) - self.offset
+        length = (end - start).days + 1
+        if length <= 0:
+            return 0, 0
+        value = self._as_int()
+        window = value >> low if low >= 0 else value << -low
+        return window & ((1 << length) - 1), length
+
+    def count_between(self, start, end):
+        """Return the number of active days in an inclusive date range."""
+        window, _ = self._window(start, end)
+        return window.bit_count()
+
+    def consistency(self, start, end):
+        """Return the percentage of days in an inclusive range that were active."""
+        window, length = self._window(start, end)
+        if not length:
+            return 0.0
+        return window.bit_count() / length * 100
+
+    def heatmap(self, start, end):
+        """Return a list of 0/1 flags, one per day of an inclusive range."""
+        window, length = self._window(start, end)
+        return [(window >> i) & 1 for i in range(length)]
+
+    def run_ending_at(self, value):
+        """Return the number of consecutive active days ending on a date."""
+        if value not in self:
+            return 0
+        index = epoch_day(value) - self.offset
+        zeros = ~self._as_int() & ((1 << (index + 1)) - 1)
+        if not zeros:
+            return index + 1
+        return index - zeros.bit_length() + 1
+
+    def longest_run(self):
+        """Return the length of the longest run of consecutive active days."""
+        value = self._as_int()
+        run = 0
+        while value:
+            value &= value >> 1
+            run += 1
+        return run
+
+    def streaks(self, today=None):
+        """Return ``(current_streak, longest_streak)`` like ``calculate_streaks``."""
+        today = today or date.today()
+        return self.run_ending_at(today), self.longest_run()
@@ -0,0 +1,153 @@
+"""
+Streaming exports of a user's full history.
+
+Rows are read with ``QuerySet.iterator()`` and encoded one at a time, so
+memory use stays flat however many years of logs and grids a user has.
+"""
+
+import csv
+import tempfile
+from datetime import date
+
+import orjson
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .grid import GridCells
+from .models import Activity, ActivityLog, DailyGrid
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+LOG_COLUMNS = ['id', 'date', 'logged_at', 'grid_position', 'activity_id', 'activity', 'notes']
+GRID_COLUMNS = ['date', 'grid_size', 'filled_count', 'completion_percentage', 'cells', 'notes']
+
+# Encoded rows are joined into blocks of about this size before being yielded
+BLOCK_BYTES = 64 * 1024
+
+
+class _Echo:
+    """File-like object for ``csv.writer`` that hands back each written row."""
+    
+    def write(self, value):
+        return value
+
+
+def log_rows(user, chunk_size=None):
+    """Yield one dict per activity log, oldest first, with its activity name."""
+    rows = (
+        ActivityLog.objects.filter(user=user)
+        .order_by('date', 'id')
+        .values_list(
+            'id', 'date', 'logged_at', 'grid_position',
+            'activity_id', 'activity__name', 'notes'
+        )
+    )
+    for row in rows.iterator(chunk_size=chunk_size or settings.EXPORT_CHUNK_SIZE):
+        yield dict(zip(LOG_COLUMNS, row))
+
+
+def grid_rows(user, chunk_size=None):
+    """
+    Yield one dict per grid, oldest first, with its filled cells.
+    
+    Activity names are read once up front, so resolving cells costs no
+    queries however many grids are streamed.
+    """
+    names = dict(Activity.objects.filter(user=user).values_list('id', 'name'))
+    rows = (
+        DailyGrid.objects.filter(user=user)
+        .order_by('date')
+        .values_list('date', 'grid_size', 'filled_count', 'cell_data', 'notes')
+    )
+    for grid_date, grid_size, filled_count, cell_data, notes in rows.iterator(
+        chunk_size=chunk_size or settings.EXPORT_CHUNK_SIZE
+    ):
+        cells = GridCells.from_bytes(cell_data, grid_size)
+        yield {
+            'date': grid_date,
+            'grid_size': grid_size,
+            'filled_count': filled_count,
+            'completion_percentage': min(100, (filled_count / grid_size) * 100),
+            'cells': [
+                {'position': position, 'activity_id': activity_id, 'activity': names.get(activity_id)}
+                for position, activity_id in cells.items()
+            ],
+            'notes': notes,
+        }
+
+
+EXPORTS = {
+    'logs': (log_rows, LOG_COLUMNS),
+    'grids': (grid_rows, GRID_COLUMNS),
+}
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return orjson.dumps(value).decode()
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def encode_csv(rows, columns):
+    """Yield a header and one encoded CSV line per row."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns).encode()
+    for row in rows:
+        yield writer.writerow([_csv_value(row[column]) for column in columns]).encode()
+
+
+def encode_ndjson(rows, columns=None):
+    """Yield one encoded JSON line per row."""
+    for row in rows:
+        yield orjson.dumps(row, option=orjson.OPT_UTC_Z | orjson.OPT_APPEND_NEWLINE)
+
+
+ENCODERS = {
+    'csv': encode_csv,
+    'ndjson': encode_ndjson,
+}
+
+
+def export_stream(user, kind, export_format, chunk_size=None):
+    """Yield a user's ``logs`` or ``grids`` export as blocks of bytes."""
+    rows, columns = EXPORTS[kind]
+    block = bytearray()
+    for line in ENCODERS[export_format](rows(user, chunk_size), columns):
+        block += line
+        if len(block) >= BLOCK_BYTES:
+            yield bytes(block)
+            block.clear()
+    if block:
+        yield bytes(block)
+
+
+def export_filename(kind, export_format):
+    """Return the download name for an export made now."""
+    return f'{kind}-{timezone.localdate().isoformat()}.{export_format}'
+
+
+def export_storage_prefix(user_id):
+    """Return the storage directory holding a user's exports."""
+    return f'exports/{user_id}/'
+
+
+def write_export(user, kind, export_format):
+    """
+    Write an export to the default storage (``MEDIA_ROOT``) and return its name.
+    
+    The export is spooled to a temporary file first, so a failed run never
+    leaves a truncated file behind.
+    """
+    with tempfile.TemporaryFile() as spool:
+        for block in export_stream(user, kind, export_format):
+            spool.write(block)
+        spool.seek(0)
+        name = export_storage_prefix(user.pk) + export_filename(kind, export_format)
+        return default_storage.save(name, File(spool))
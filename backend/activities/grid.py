@@ -0,0 +1,112 @@
+"""
+Compact storage for daily grid contents.
+
+A grid is stored as one little-endian unsigned 32-bit activity id per cell,
+with 0 marking an empty cell, instead of a JSON object keyed by position.
+"""
+
+import sys
+from array import array
+
+EMPTY = 0
+
+# Largest activity id a cell can hold
+MAX_ACTIVITY_ID = 2 ** 32 - 1
+
+
+class GridCells:
+    """Fixed-length activity ids for the cells of one grid."""
+    __slots__ = ('_ids',)
+
+    def __init__(self, size, ids=None):
+        self._ids = array('I', ids if ids is not None else bytes(4 * size))
+        if len(self._ids) != size:
+            self.resize(size)
+
+    @classmethod
+    def from_bytes(cls, data, size):
+        """Decode packed cells, padding or truncating to ``size``."""
+        ids = array('I')
+        ids.frombytes(bytes(data or b''))
+        if sys.byteorder == 'big':
+            ids.byteswap()
+        return cls(size, ids)
+
+    @classmethod
+    def from_dict(cls, mapping, size):
+        """Build cells from the legacy ``{"position": activity_id}`` JSON form."""
+        cells = cls(size)
+        for position, activity_id in (mapping or {}).items():
+            cells[int(position)] = int(activity_id)
+        return cells
+
+    @classmethod
+    def from_legacy(cls, mapping, size):
+        """Build cells from legacy JSON as stored, skipping entries that cannot be placed."""
+        cells = cls(size)
+        for position, activity_id in (mapping or {}).items():
+            try:
+                cells[int(position)] = int(activity_id or EMPTY)
+            except (TypeError, ValueError):
+                continue
+        return cells
+
+    def to_bytes(self):
+        """Encode the cells as packed little-endian bytes."""
+        if sys.byteorder == 'big':
+            ids = array('I', self._ids)
+            ids.byteswap()
+            return ids.tobytes()
+        return self._ids.tobytes()
+
+    def to_dict(self):
+        """Return the filled cells in the legacy ``{"position": activity_id}`` form."""
+        return {str(position): activity_id for position, activity_id in self.items()}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __getitem__(self, position):
+        """Return the activity id at a position, or None if the cell is empty."""
+        return self._ids[position] or None
+
+    def __setitem__(self, position, activity_id):
+        if not 0 <= position < len(self._ids):
+            raise ValueError("Invalid grid position")
+        try:
+            self._ids[position] = activity_id or EMPTY
+        except OverflowError:
+            raise ValueError("Activity id does not fit in a grid cell")
+
+    def __delitem__(self, position):
+        self[position] = EMPTY
+
+    def __eq__(self, other):
+        if not isinstance(other, GridCells):
+            return NotImplemented
+        return self._ids == other._ids
+
+    def __repr__(self):
+        return f"GridCells({len(self)}, {self.to_dict()!r})"
+
+    @property
+    def filled(self):
+        """Return the number of non-empty cells."""
+        return len(self._ids) - self._ids.count(EMPTY)
+
+    def items(self):
+        """Yield ``(position, activity_id)`` for each filled cell."""
+        for position, activity_id in enumerate(self._ids):
+            if activity_id:
+                yield position, activity_id
+
+    def activity_ids(self):
+        """Return the set of activity ids present in the grid."""
+        return {activity_id for activity_id in self._ids if activity_id}
+
+    def resize(self, size):
+        """Grow with empty cells or drop cells past the new size."""
+        if size < len(self._ids):
+            del self._ids[size:]
+        else:
+            self._ids.extend([EMPTY] * (size - len(self._ids)))
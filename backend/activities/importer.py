@@ -0,0 +1,314 @@
+"""
+Bulk import of check-in history from other habit trackers.
+
+Uploads are parsed as a stream of rows and written in batches: missing
+activities are created, each batch's grids are filled in memory and saved
+with one ``bulk_update``, and logs are inserted with ``bulk_create`` without
+the per-row ``ActivityLog.save()`` side effects. Derived data (day bitmaps,
+rollups, analytics, cached responses) is rebuilt once at the end through the
+``history_imported`` signal.
+"""
+
+import csv
+import io
+import json
+from datetime import date
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Activity, ActivityLog, DailyGrid, SyncChange
+from .signals import history_imported
+
+IMPORT_FORMATS = ('csv', 'ndjson', 'json')
+
+# Characters read at a time when scanning a JSON array
+JSON_READ_SIZE = 64 * 1024
+
+# Row errors kept in the report; later ones are only counted
+MAX_REPORTED_ERRORS = 50
+
+
+def guess_format(filename):
+    """Return the import format for a file name's extension, or None."""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'jsonl':
+        return 'ndjson'
+    return extension if extension in IMPORT_FORMATS else None
+
+
+def _iter_json_array(text):
+    """Yield the items of a top-level JSON array without reading it all at once."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+    
+    while True:
+        stripped = buffer.lstrip()
+        if not started:
+            if stripped.startswith('['):
+                buffer = stripped[1:]
+                started = True
+                continue
+            if stripped:
+                raise ValueError('JSON imports must be an array of objects')
+        else:
+            stripped = stripped.lstrip(',').lstrip()
+            if stripped.startswith(']'):
+                return
+            if stripped:
+                try:
+                    item, end = decoder.raw_decode(stripped)
+                except json.JSONDecodeError:
+                    # The item may continue in the next chunk
+                    if eof:
+                        raise ValueError('Invalid JSON')
+                    buffer = stripped
+                else:
+                    yield item
+                    buffer = stripped[end:]
+                    continue
+            else:
+                buffer = ''
+        
+        if eof:
+            raise ValueError('Unexpected end of JSON')
+        chunk = text.read(JSON_READ_SIZE)
+        if not chunk:
+            eof = True
+        buffer += chunk
+
+
+def read_rows(stream, import_format):
+    """
+    Yield ``(line, row)`` for each record in a binary stream.
+    
+    CSV rows are dicts keyed by the header; NDJSON and JSON rows are the
+    decoded values, with undecodable NDJSON lines yielded as None.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        if import_format == 'csv':
+            reader = csv.DictReader(text)
+            for row in reader:
+                yield reader.line_num, row
+        elif import_format == 'ndjson':
+            for line, content in enumerate(text, 1):
+                if not content.strip():
+                    continue
+                try:
+                    yield line, json.loads(content)
+                except ValueError:
+                    yield line, None
+        else:
+            yield from enumerate(_iter_json_array(text), 1)
+    finally:
+        # Leave the caller's stream open
+        text.detach()
+
+
+def parse_row(row, user_tz):
+    """Return a check-in dict for one source row, raising ValueError if it is unusable."""
+    if not isinstance(row, dict):
+        raise ValueError('Row is not an object')
+    
+    name = str(row.get('activity') or row.get('name') or '').strip()[:100]
+    if not name:
+        raise ValueError('Missing activity name')
+    
+    logged_at = None
+    if row.get('logged_at'):
+        logged_at = parse_datetime(str(row['logged_at']))
+        if logged_at is None:
+            raise ValueError('Invalid logged_at timestamp')
+        if timezone.is_naive(logged_at):
+            logged_at = timezone.make_aware(logged_at, user_tz)
+    
+    if row.get('date'):
+        try:
+            day = date.fromisoformat(str(row['date'])[:10])
+        except ValueError:
+            raise ValueError('Dates must be in YYYY-MM-DD format')
+    elif logged_at is not None:
+        day = logged_at.astimezone(user_tz).date()
+    else:
+        raise ValueError('Missing date')
+    
+    position = row.get('grid_position', row.get('position'))
+    if position in (None, ''):
+        position = None
+    else:
+        try:
+            position = int(position)
+        except (TypeError, ValueError):
+            raise ValueError('Invalid grid position')
+    
+    return {
+        'name': name,
+        'date': day,
+        'position': position,
+        'logged_at': logged_at,
+        'notes': str(row.get('notes') or ''),
+    }
+
+
+def _record_error(report, line, message):
+    report['errors'] += 1
+    if len(report['error_samples']) < MAX_REPORTED_ERRORS:
+        report['error_samples'].append({'line': line, 'error': message})
+
+
+def _write_batch(user, checkins, activity_ids, report):
+    """Write one batch of parsed check-ins, updating ``activity_ids`` and ``report``."""
+    dates = {checkin['date'] for _, checkin in checkins}
+    
+    with transaction.atomic():
+        new_names = {}
+        for _, checkin in checkins:
+            new_names.setdefault(checkin['name'].casefold(), checkin['name'])
+        for key in activity_ids.keys() & new_names.keys():
+            del new_names[key]
+        if new_names:
+            created = Activity.objects.bulk_create([
+                Activity(user=user, name=name) for name in new_names.values()
+            ])
+            activity_ids.update((activity.name.casefold(), activity.id) for activity in created)
+            SyncChange.record(user.id, SyncChange.KIND_ACTIVITY, [activity.id for activity in created])
+            report['activities_created'] += len(created)
+        
+        grids = DailyGrid.objects.select_for_update().filter(user=user, date__in=dates)
+        grids_by_date = {grid.date: grid for grid in grids}
+        if len(grids_by_date) < len(dates):
+            DailyGrid.objects.bulk_create(
+                [
+                    DailyGrid(user=user, date=grid_date, grid_size=user.default_grid_size)
+                    for grid_date in dates - grids_by_date.keys()
+                ],
+                ignore_conflicts=True
+            )
+            grids_by_date = {grid.date: grid for grid in grids.all()}
+        
+        logged = set(
+            ActivityLog.objects.filter(user=user, date__in=dates)
+            .values_list('activity_id', 'date', 'grid_position')
+        )
+        
+        logs = []
+        touched = set()
+        for line, checkin in checkins:
+            grid = grids_by_date[checkin['date']]
+            activity_id = activity_ids[checkin['name'].casefold()]
+            position = checkin['position']
+            if position is None:
+                # Without a position, one check-in per activity and day is kept
+                if activity_id in grid.cells.activity_ids():
+                    report['duplicates'] += 1
+                    continue
+                position = next(
+                    (cell for cell in range(grid.grid_size) if grid.cells[cell] is None),
+                    None
+                )
+                if position is None:
+                    _record_error(report, line, 'Grid is full')
+                    continue
+            elif not 0 <= position < grid.grid_size:
+                _record_error(report, line, 'Invalid grid position')
+                continue
+            
+            key = (activity_id, checkin['date'], position)
+            if key in logged:
+                report['duplicates'] += 1
+                continue
+            
+            grid.cells[position] = activity_id
+            logged.add(key)
+            touched.add(checkin['date'])
+            logs.append(ActivityLog(
+                user=user,
+                activity_id=activity_id,
+                date=checkin['date'],
+                grid_position=position,
+                logged_at=checkin['logged_at'],
+                notes=checkin['notes']
+            ))
+        
+        touched_grids = [grids_by_date[grid_date] for grid_date in sorted(touched)]
+        now = timezone.now()
+        for grid in touched_grids:
+            grid.pack_cells()
+            grid.updated_at = now
+        DailyGrid.objects.bulk_update(touched_grids, DailyGrid.CELL_FIELDS)
+        
+        # bulk_create stamps logged_at with the current time, so the source
+        # timestamps are written back afterwards
+        timestamps = [log.logged_at for log in logs]
+        created = ActivityLog.objects.bulk_create(logs)
+        stamped = []
+        for log, logged_at in zip(created, timestamps):
+            if logged_at is not None:
+                log.logged_at = logged_at
+                stamped.append(log)
+        ActivityLog.objects.bulk_update(stamped, ['logged_at'], batch_size=500)
+        
+        SyncChange.record(user.id, SyncChange.KIND_GRID, [grid.pk for grid in touched_grids])
+        SyncChange.record(user.id, SyncChange.KIND_LOG, [log.pk for log in created])
+        report['imported'] += len(created)
+
+
+def import_history(user, stream, import_format, progress=None, batch_size=None):
+    """
+    Import check-ins for a user from a binary CSV, NDJSON or JSON stream.
+    
+    ``progress`` is called with the report after every batch. Returns the
+    report: counts of rows ``processed``, ``imported``, ``duplicates`` and
+    ``errors``, the number of ``activities_created`` and the first few
+    ``error_samples``.
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    try:
+        user_tz = ZoneInfo(user.timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        user_tz = ZoneInfo('UTC')
+    
+    activity_ids = {}
+    for activity_id, name in (
+        Activity.objects.filter(user=user)
+        .order_by('-is_active', 'id')
+        .values_list('id', 'name')
+    ):
+        activity_ids.setdefault(name.casefold(), activity_id)
+    
+    report = {
+        'processed': 0,
+        'imported': 0,
+        'duplicates': 0,
+        'errors': 0,
+        'activities_created': 0,
+        'error_samples': [],
+    }
+    
+    checkins = []
+    for line, row in read_rows(stream, import_format):
+        report['processed'] += 1
+        try:
+            checkins.append((line, parse_row(row, user_tz)))
+        except ValueError as e:
+            _record_error(report, line, str(e))
+        
+        if len(checkins) >= batch_size:
+            _write_batch(user, checkins, activity_ids, report)
+            checkins = []
+            if progress:
+                progress(report)
+    if checkins:
+        _write_batch(user, checkins, activity_ids, report)
+    if progress:
+        progress(report)
+    
+    if report['imported'] or report['activities_created']:
+        history_imported.send(sender=ActivityLog, user_id=user.id)
+    return report
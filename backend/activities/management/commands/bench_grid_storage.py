@@ -0,0 +1,51 @@
+"""
+Compare the legacy JSON grid format with packed grid cells.
+"""
+
+import json
+import random
+import timeit
+
+from django.core.management.base import BaseCommand
+
+from activities.grid import GridCells
+
+
+class Command(BaseCommand):
+    help = 'Report stored size and encode/decode time for JSON and packed grid contents.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        iterations = options['iterations']
+
+        self.stdout.write(
+            f'{"size":>4} {"fill":>5} {"json B":>7} {"packed B":>8} '
+            f'{"json dec us":>11} {"packed dec us":>13} {"json enc us":>11} {"packed enc us":>13}'
+        )
+        for size in (16, 36, 64):
+            for fill in (0.25, 0.5, 1.0):
+                positions = rng.sample(range(size), int(size * fill))
+                mapping = {str(position): rng.randint(1, 2_000_000) for position in positions}
+                text = json.dumps(mapping)
+                cells = GridCells.from_dict(mapping, size)
+                packed = cells.to_bytes()
+                assert GridCells.from_bytes(packed, size).to_dict() == mapping
+
+                json_decode = timeit.timeit(
+                    lambda: {int(k): v for k, v in json.loads(text).items()}, number=iterations
+                )
+                packed_decode = timeit.timeit(
+                    lambda: GridCells.from_bytes(packed, size), number=iterations
+                )
+                json_encode = timeit.timeit(lambda: json.dumps(mapping), number=iterations)
+                packed_encode = timeit.timeit(cells.to_bytes, number=iterations)
+
+                self.stdout.write(
+                    f'{size:>4} {fill:>5.0%} {len(text):>7} {len(packed):>8} '
+                    f'{json_decode / iterations * 1e6:>11.2f} {packed_decode / iterations * 1e6:>13.2f} '
+                    f'{json_encode / iterations * 1e6:>11.2f} {packed_encode / iterations * 1e6:>13.2f}'
+                )
@@ -0,0 +1,96 @@
+"""
+Benchmark concurrent single taps through DailyGrid.log_activity.
+"""
+
+import statistics
+import threading
+import time
+import uuid
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.test.utils import CaptureQueriesContext
+
+from activities.models import Activity, DailyGrid
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Fire concurrent taps at one grid, reporting latency, queries per tap '
+        'and any positions lost to concurrent writes. Uses a throwaway user.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--taps', type=int, default=64, help='Total taps, at most 64.')
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        taps = options['taps']
+        if not 0 < taps <= 64:
+            raise CommandError('--taps must be between 1 and 64.')
+
+        user = User.objects.create_user(
+            username=f'bench-{uuid.uuid4().hex[:12]}',
+            default_grid_size=64
+        )
+        try:
+            activity = Activity.objects.create(user=user, name='Benchmark')
+            grid = DailyGrid.objects.create(user=user, date=date.today(), grid_size=64)
+
+            latencies = []
+            query_counts = []
+            errors = []
+            lock = threading.Lock()
+            positions = list(range(taps))
+
+            def worker(worker_positions):
+                try:
+                    for position in worker_positions:
+                        tap_grid = DailyGrid.objects.get(pk=grid.pk)
+                        with CaptureQueriesContext(connection) as queries:
+                            started = time.perf_counter()
+                            tap_grid.log_activity(activity, position)
+                            elapsed = time.perf_counter() - started
+                        with lock:
+                            latencies.append(elapsed * 1000)
+                            query_counts.append(len(queries))
+                except Exception as exc:  # Reported below
+                    with lock:
+                        errors.append(repr(exc))
+                finally:
+                    close_old_connections()
+                    connection.close()
+
+            workers = [
+                threading.Thread(target=worker, args=(positions[i::threads],))
+                for i in range(threads)
+            ]
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+
+            grid.refresh_from_db()
+            lost = sorted(set(positions) - {position for position, _ in grid.cells.items()})
+
+            for error in errors:
+                self.stdout.write(self.style.ERROR(error))
+            if latencies:
+                latencies.sort()
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                self.stdout.write(
+                    f'{len(latencies)} taps on {threads} threads: '
+                    f'p50 {statistics.median(latencies):.2f} ms, p99 {p99:.2f} ms, '
+                    f'queries per tap max {max(query_counts)} / mean {statistics.mean(query_counts):.1f}'
+                )
+            if lost:
+                self.stdout.write(self.style.ERROR(f'Lost positions: {lost}'))
+            else:
+                self.stdout.write(self.style.SUCCESS('No positions lost.'))
+        finally:
+            user.delete()
@@ -0,0 +1,101 @@
+"""
+Benchmark tap latency with and without the Redis write-behind buffer.
+"""
+
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+
+import redis
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from activities import write_behind
+from activities.models import Activity, DailyGrid
+
+User = get_user_model()
+
+GRID_SIZE = 64
+
+
+class Command(BaseCommand):
+    help = (
+        'Time sequential taps written directly and through the write-behind '
+        'buffer, then flush the buffer and check no taps were lost. Needs '
+        'Redis and uses a throwaway user.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taps', type=int, default=256, help='Taps per mode.')
+
+    def handle(self, *args, **options):
+        taps = options['taps']
+        if taps <= 0:
+            raise CommandError('--taps must be positive.')
+        try:
+            write_behind.get_client().ping()
+        except redis.RedisError as exc:
+            raise CommandError(f'Redis is not reachable: {exc}')
+
+        days = -(-taps // GRID_SIZE)
+        user = User.objects.create_user(
+            username=f'bench-{uuid.uuid4().hex[:12]}',
+            default_grid_size=GRID_SIZE
+        )
+        try:
+            activity = Activity.objects.create(user=user, name='Benchmark')
+            start = date.today() - timedelta(days=2 * days - 1)
+            grids = DailyGrid.objects.bulk_create([
+                DailyGrid(user=user, date=start + timedelta(days=day), grid_size=GRID_SIZE)
+                for day in range(2 * days)
+            ])
+            direct_grids, buffered_grids = grids[:days], grids[days:]
+
+            direct = self._time_taps(taps, direct_grids, lambda grid, position: grid.log_activity(activity, position))
+            buffered = self._time_taps(taps, buffered_grids, lambda grid, position: write_behind.buffer_tap(grid, activity, position))
+
+            started = time.perf_counter()
+            flushed = 0
+            while True:
+                processed = write_behind.flush_user(user, 'bench')
+                flushed += processed
+                if not processed:
+                    break
+            flush_ms = (time.perf_counter() - started) * 1000
+
+            self._report('direct', direct)
+            self._report('buffered', buffered)
+            self.stdout.write(f'flushed {flushed} buffered taps in {flush_ms:.1f} ms')
+
+            expected = {
+                (buffered_grids[i // GRID_SIZE].date, i % GRID_SIZE) for i in range(taps)
+            }
+            stored = {
+                (grid.date, position)
+                for grid in DailyGrid.objects.filter(pk__in=[grid.pk for grid in buffered_grids])
+                for position, _ in grid.cells.items()
+            }
+            lost = sorted(expected - stored)
+            if lost:
+                self.stdout.write(self.style.ERROR(f'Lost {len(lost)} buffered taps: {lost[:10]}'))
+            else:
+                self.stdout.write(self.style.SUCCESS('No buffered taps lost.'))
+        finally:
+            write_behind.discard_user(user.id)
+            user.delete()
+
+    def _time_taps(self, taps, grids, tap):
+        latencies = []
+        for i in range(taps):
+            started = time.perf_counter()
+            tap(grids[i // GRID_SIZE], i % GRID_SIZE)
+            latencies.append((time.perf_counter() - started) * 1000)
+        return sorted(latencies)
+
+    def _report(self, label, latencies):
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f'{label}: {len(latencies)} taps, p50 {statistics.median(latencies):.2f} ms, '
+            f'p99 {p99:.2f} ms'
+        )
@@ -0,0 +1,75 @@
+"""
+Convert legacy JSON grid contents into packed grid cells.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from activities.grid import GridCells
+from activities.models import DailyGrid
+
+
+class Command(BaseCommand):
+    help = (
+        'Move DailyGrid contents from the legacy activities_logged JSON column '
+        'into packed cell_data, verifying that every position round-trips.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Verify the conversion without writing anything.',
+        )
+
+    def handle(self, *args, **options):
+        grids = (
+            DailyGrid.objects.exclude(legacy_activities_logged={})
+            .order_by('id')
+            .only('id', 'grid_size', 'cell_data', 'filled_count', 'legacy_activities_logged')
+        )
+
+        converted = 0
+        failed = 0
+        batch = []
+        for grid in grids.iterator(chunk_size=options['batch_size']):
+            legacy = grid.legacy_activities_logged
+            try:
+                expected = {str(int(position)): int(activity_id) for position, activity_id in legacy.items() if activity_id}
+                legacy_cells = GridCells.from_dict(expected, grid.grid_size)
+            except (AttributeError, TypeError, ValueError) as exc:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'Grid {grid.pk}: {exc}'))
+                continue
+
+            if legacy_cells.to_dict() != expected:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'Grid {grid.pk}: contents do not round-trip'))
+                continue
+
+            # Taps written since the switch to packed cells win over legacy values
+            for position, activity_id in legacy_cells.items():
+                if not grid.cells[position]:
+                    grid.cells[position] = activity_id
+            grid.legacy_activities_logged = {}
+            grid.pack_cells()
+            batch.append(grid)
+
+            if len(batch) >= options['batch_size']:
+                converted += self.write(batch, options['dry_run'])
+                batch = []
+        if batch:
+            converted += self.write(batch, options['dry_run'])
+
+        action = 'Verified' if options['dry_run'] else 'Converted'
+        style = self.style.ERROR if failed else self.style.SUCCESS
+        self.stdout.write(style(f'{action} {converted} grids ({failed} failed).'))
+
+    def write(self, grids, dry_run):
+        if not dry_run:
+            with transaction.atomic():
+                DailyGrid.objects.bulk_update(
+                    grids, ['cell_data', 'filled_count', 'legacy_activities_logged']
+                )
+        return len(grids)
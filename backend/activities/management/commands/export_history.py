@@ -0,0 +1,66 @@
+"""
+Export a user's full activity history as CSV or NDJSON.
+"""
+
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from activities.export import EXPORT_FORMATS, EXPORTS, export_stream, write_export
+from activities.tasks import export_history
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a user's activity logs or grids as CSV or NDJSON to a file or "
+        'stdout, or write the export to media storage, optionally on a Celery worker.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--kind', choices=sorted(EXPORTS), default='logs')
+        parser.add_argument('--format', dest='export_format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument(
+            '--output',
+            default='-',
+            help='File to write, "-" for stdout (default) or "media" for media storage.',
+        )
+        parser.add_argument(
+            '--queue',
+            action='store_true',
+            help='Queue the media storage export as a Celery task instead of running it here.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']!r} does not exist.")
+
+        kind = options['kind']
+        export_format = options['export_format']
+        output = options['output']
+
+        if options['queue']:
+            if output not in ('-', 'media'):
+                raise CommandError('--queue always writes to media storage.')
+            result = export_history.delay(user.id, kind, export_format)
+            self.stderr.write(f'Queued export task {result.id}.')
+            return
+        if output == 'media':
+            name = write_export(user, kind, export_format)
+            self.stderr.write(self.style.SUCCESS(f'Wrote {name}.'))
+            return
+
+        if output == '-':
+            for block in export_stream(user, kind, export_format):
+                sys.stdout.buffer.write(block)
+            sys.stdout.buffer.flush()
+            return
+        with open(output, 'wb') as destination:
+            for block in export_stream(user, kind, export_format):
+                destination.write(block)
+        self.stderr.write(self.style.SUCCESS(f'Wrote {output}.'))
@@ -0,0 +1,82 @@
+"""
+Import check-in history for a user from a CSV, NDJSON or JSON file.
+"""
+
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from activities.importer import IMPORT_FORMATS, guess_format, import_history
+from activities.tasks import import_history as import_history_task
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import a user's check-ins from another habit tracker's export, "
+        'creating missing activities and rebuilding analytics once at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format',
+            dest='import_format',
+            choices=IMPORT_FORMATS,
+            help='File format; guessed from the extension by default.',
+        )
+        parser.add_argument('--batch-size', type=int, help='Check-ins written per transaction.')
+        parser.add_argument(
+            '--queue',
+            action='store_true',
+            help='Copy the file to media storage and import it on a Celery worker.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']!r} does not exist.")
+
+        import_format = options['import_format'] or guess_format(options['path'])
+        if import_format is None:
+            raise CommandError('Could not tell the format from the file name; pass --format.')
+
+        try:
+            source = open(options['path'], 'rb')
+        except OSError as e:
+            raise CommandError(str(e))
+
+        with source:
+            if options['queue']:
+                name = default_storage.save(
+                    f'imports/{user.id}/{uuid.uuid4().hex}.{import_format}',
+                    File(source)
+                )
+                result = import_history_task.delay(user.id, name, import_format)
+                self.stdout.write(f'Queued import task {result.id}.')
+                return
+
+            report = import_history(
+                user,
+                source,
+                import_format,
+                progress=self.report_progress,
+                batch_size=options['batch_size']
+            )
+
+        for sample in report['error_samples']:
+            self.stdout.write(self.style.WARNING(f"Line {sample['line']}: {sample['error']}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['imported']} of {report['processed']} rows "
+            f"({report['duplicates']} duplicates, {report['errors']} errors, "
+            f"{report['activities_created']} activities created)."
+        ))
+
+    def report_progress(self, report):
+        self.stdout.write(f"{report['processed']} rows read, {report['imported']} imported")
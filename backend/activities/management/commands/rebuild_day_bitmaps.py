@@ -0,0 +1,71 @@
+"""
+Rebuild ActivityDayBitmap rows and optionally verify them.
+"""
+
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from activities.models import ActivityDayBitmap, ActivityLog
+from activities.streaks import calculate_streaks
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-activity and per-user day bitmaps from ActivityLog rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            dest='usernames',
+            action='append',
+            default=[],
+            help='Only rebuild bitmaps for this username (repeatable).',
+        )
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Compare stored bitmaps with ORM-based calculations instead of rebuilding.',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+
+        if options['verify']:
+            mismatches = sum(self.verify(user_id) for user_id in users.values_list('id', flat=True))
+            if mismatches:
+                raise CommandError(f'{mismatches} day bitmaps disagree with activity logs.')
+            self.stdout.write(self.style.SUCCESS('All day bitmaps match activity logs.'))
+            return
+
+        total_rows = 0
+        total_users = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            total_rows += ActivityDayBitmap.rebuild(user_id)
+            total_users += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {total_rows} day bitmaps for {total_users} users.'
+        ))
+
+    def verify(self, user_id):
+        """Return the number of a user's bitmaps that disagree with their logs."""
+        today = date.today()
+        mismatches = 0
+        for row in ActivityDayBitmap.objects.filter(user_id=user_id):
+            logs = ActivityLog.objects.filter(user_id=user_id)
+            if row.activity_id is not None:
+                logs = logs.filter(activity_id=row.activity_id)
+            dates = list(logs.order_by('date').values_list('date', flat=True).distinct())
+
+            bitmap = row.bitmap
+            expected = (list(bitmap.dates()), bitmap.streaks(today))
+            actual = (dates, calculate_streaks(dates, today=today))
+            if expected != actual:
+                mismatches += 1
+                self.stdout.write(self.style.WARNING(f'Mismatch: {row}'))
+        return mismatches
@@ -2,11 +2,17 @@
 Activity and Grid models for Box Grid Habit Tracker.
 """
 
-from django.db import models
+from datetime import date, timedelta
+
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import gettext_lazy as _
 
+from .bitmap import DayBitmap
+from .grid import GridCells
+
 User = get_user_model()
 
 
@@ -29,6 +35,32 @@ class ActivityCategory(models.Model):
         return self.name
 
 
+class ActivityQuerySet(models.QuerySet):
+    """QuerySet helpers for batched activity metrics."""
+    
+    def with_log_counts(self):
+        """Annotate total logs and logs from the last 30 days in one query."""
+        thirty_days_ago = date.today() - timedelta(days=30)
+        return self.annotate(
+            total_log_count=Coalesce(models.Sum('daily_rollups__log_count'), 0),
+            recent_log_count=Coalesce(
+                models.Sum(
+                    'daily_rollups__log_count',
+                    filter=models.Q(daily_rollups__date__gte=thirty_days_ago)
+                ),
+                0
+            ),
+        )
+    
+    def with_day_bitmaps(self):
+        """Annotate each activity's day bitmap so streaks need no extra queries."""
+        bitmaps = ActivityDayBitmap.objects.filter(activity=models.OuterRef('pk'))
+        return self.annotate(
+            day_bitmap_offset=models.Subquery(bitmaps.values('offset')[:1]),
+            day_bitmap_bits=models.Subquery(bitmaps.values('bits')[:1]),
+        )
+
+
 class Activity(models.Model):
     """
     User-defined activities that can be logged in the grid.
@@ -71,11 +103,21 @@ class Activity(models.Model):
     reminder_time = models.TimeField(null=True, blank=True)
     reminder_days = models.JSONField(default=list, blank=True)
     
+    objects = ActivityQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _('Activity')
         verbose_name_plural = _('Activities')
         ordering = ['-created_at']
         unique_together = ['user', 'name']
+        indexes = [
+            # Most reads only want a user's active activities
+            models.Index(
+                fields=['user'],
+                condition=models.Q(is_active=True),
+                name='activity_user_active'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.name}"
@@ -83,27 +125,50 @@ class Activity(models.Model):
     @property
     def completion_rate(self):
         """Calculate completion rate for the last 30 days."""
-        from datetime import date, timedelta
-        thirty_days_ago = date.today() - timedelta(days=30)
-        total_logs = self.activity_logs.filter(date__gte=thirty_days_ago).count()
+        total_logs = getattr(self, 'recent_log_count', None)
+        if total_logs is None:
+            thirty_days_ago = date.today() - timedelta(days=30)
+            total_logs = self.daily_rollups.filter(
+                date__gte=thirty_days_ago
+            ).aggregate(total=models.Sum('log_count'))['total'] or 0
         return min(100, (total_logs / 30) * 100)
     
     @property
     def current_streak(self):
         """Calculate current streak of consecutive days."""
-        from datetime import date, timedelta
-        
-        current_date = date.today()
-        streak = 0
+        from .streaks import get_activity_streaks
         
-        while True:
-            if self.activity_logs.filter(date=current_date).exists():
-                streak += 1
-                current_date -= timedelta(days=1)
-            else:
-                break
+        return get_activity_streaks(self)[0]
+    
+    @property
+    def longest_streak(self):
+        """Calculate longest streak of consecutive days."""
+        from .streaks import get_activity_streaks
         
-        return streak
+        return get_activity_streaks(self)[1]
+
+
+class DailyGridQuerySet(models.QuerySet):
+    """QuerySet helpers for rendering grids server-side."""
+    
+    _hydrate_activities = False
+    
+    def _clone(self):
+        clone = super()._clone()
+        clone._hydrate_activities = self._hydrate_activities
+        return clone
+    
+    def with_activities(self):
+        """Resolve every cell's activity with one query when the grids are loaded."""
+        clone = self._chain()
+        clone._hydrate_activities = True
+        return clone
+    
+    def _fetch_all(self):
+        hydrate = self._hydrate_activities and self._result_cache is None
+        super()._fetch_all()
+        if hydrate and self._iterable_class is models.query.ModelIterable:
+            DailyGrid.hydrate(self._result_cache)
 
 
 class DailyGrid(models.Model):
@@ -117,19 +182,42 @@ class DailyGrid(models.Model):
         validators=[MinValueValidator(4), MaxValueValidator(64)],
         help_text=_('Grid size (4x4=16, 6x6=36, 8x8=64)')
     )
-    activities_logged = models.JSONField(
+    cell_data = models.BinaryField(
+        default=bytes,
+        help_text=_('Packed activity IDs, one little-endian uint32 per grid position')
+    )
+    filled_count = models.PositiveSmallIntegerField(default=0)
+    # Pre-compaction JSON mapping of positions to activity IDs. Kept only until
+    # the compact_grid_storage command has converted every row.
+    legacy_activities_logged = models.JSONField(
+        db_column='activities_logged',
         default=dict,
-        help_text=_('JSON mapping of grid positions to activity IDs')
+        blank=True,
+        editable=False
     )
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Fields to pass as update_fields when only the grid contents changed
+    CELL_FIELDS = ['cell_data', 'filled_count', 'updated_at']
+    
+    _cells = None
+    _cells_source = None
+    
+    # Activity id to Activity (or None if missing) for ids already resolved
+    _activity_map = None
+    
+    objects = DailyGridQuerySet.as_manager()
+    
     class Meta:
         verbose_name = _('Daily Grid')
         verbose_name_plural = _('Daily Grids')
         unique_together = ['user', 'date']
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['user', '-date', '-id'], name='grid_user_date_cursor'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.date}"
@@ -146,37 +234,253 @@ class DailyGrid(models.Model):
         else:
             return 4, 4  # Default fallback
     
+    @property
+    def cells(self):
+        """
+        Return the grid contents as ``GridCells``, decoded once per load.
+        
+        Rows that compact_grid_storage has not converted yet have no
+        ``cell_data`` and are decoded from the legacy JSON instead.
+        """
+        if self._cells is None or self._cells_source is not self.cell_data:
+            if not self.cell_data and self.legacy_activities_logged:
+                self._cells = GridCells.from_legacy(self.legacy_activities_logged, self.grid_size)
+            else:
+                self._cells = GridCells.from_bytes(self.cell_data, self.grid_size)
+            self._cells_source = self.cell_data
+        return self._cells
+    
+    @cells.setter
+    def cells(self, value):
+        self._cells = value
+        self.pack_cells()
+    
+    @property
+    def activities_logged(self):
+        """Return the filled cells as a ``{"position": activity_id}`` mapping."""
+        return self.cells.to_dict()
+    
     @property
     def completion_percentage(self):
         """Calculate completion percentage of the grid."""
-        filled_positions = len(self.activities_logged)
+        if self._cells is not None:
+            filled_positions = self._cells.filled
+        else:
+            filled_positions = self.filled_count
         return min(100, (filled_positions / self.grid_size) * 100)
     
+    def pack_cells(self):
+        """Write decoded cells back to ``cell_data`` and ``filled_count``."""
+        if self._cells is None:
+            return
+        if len(self._cells) != self.grid_size:
+            self._cells.resize(self.grid_size)
+        self.cell_data = self._cells.to_bytes()
+        self._cells_source = self.cell_data
+        self.filled_count = self._cells.filled
+    
+    def save(self, *args, **kwargs):
+        self.pack_cells()
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def hydrate(cls, grids):
+        """
+        Resolve the activities of many grids with one ``IN`` query.
+        
+        Returns ``{grid.pk: {position: Activity}}``; afterwards each grid's
+        ``activities_by_position()`` is answered without a query.
+        """
+        grids = list(grids)
+        activity_ids = set().union(*(grid.cells.activity_ids() for grid in grids))
+        activities = Activity.objects.in_bulk(activity_ids) if activity_ids else {}
+        
+        for grid in grids:
+            grid._activity_map = {}
+            for activity_id in grid.cells.activity_ids():
+                activity = activities.get(activity_id)
+                if activity is not None and activity.user_id != grid.user_id:
+                    activity = None
+                grid._activity_map[activity_id] = activity
+        return {grid.pk: grid.activities_by_position() for grid in grids}
+    
+    def activities_by_position(self):
+        """Return ``{position: Activity}`` for the grid's filled cells."""
+        if self._activity_map is None or not self.cells.activity_ids() <= self._activity_map.keys():
+            DailyGrid.hydrate([self])
+        return {
+            position: self._activity_map[activity_id]
+            for position, activity_id in self.cells.items()
+            if self._activity_map[activity_id] is not None
+        }
+    
     def get_activity_at_position(self, position):
         """Get activity at a specific grid position."""
-        activity_id = self.activities_logged.get(str(position))
-        if activity_id:
-            try:
-                return Activity.objects.get(id=activity_id, user=self.user)
-            except Activity.DoesNotExist:
-                return None
-        return None
+        return self.activities_by_position().get(position)
     
     def log_activity(self, activity, position):
-        """Log an activity at a specific position."""
+        """
+        Log an activity at a specific position.
+        
+        The grid row is locked and re-read, so concurrent taps on the same day
+        cannot drop each other's positions, and it is written exactly once.
+        The log is inserted without re-syncing the grid. Re-logging the same
+        activity at the same position returns the existing log.
+        
+        The method itself issues three statements (lock, grid update, log
+        insert), but the post_save handlers run in the same transaction and
+        dominate the cost of a tap on an existing day:
+        
+        * grid saved: sync feed insert, and ``track_grid_saved`` locks the
+          analytics row, averages 30 days of completion in one aggregate and
+          updates the row (4);
+        * log saved: ``index_log_day`` reads and writes two day bitmaps (4),
+          a sync feed insert (1), and ``track_log_created`` locks the
+          analytics row, checks and bumps the rollup and updates the row (4).
+        
+        That is 16 statements plus 12 savepoint statements from the nested
+        atomic blocks; the first tap of a day adds the rollup insert and its
+        savepoint. Clients that tap in bursts should use ``log_activities``
+        or the write-behind buffer, which pay the handler cost once per batch.
+        """
         if not isinstance(position, int) or position < 0 or position >= self.grid_size:
             raise ValueError("Invalid grid position")
         
-        self.activities_logged[str(position)] = activity.id
-        self.save()
+        with transaction.atomic():
+            locked = DailyGrid.objects.select_for_update().only('cell_data').get(pk=self.pk)
+            self.cell_data = locked.cell_data
+            self.cells[position] = activity.id
+            self.save(update_fields=self.CELL_FIELDS)
+            
+            # Create activity log entry
+            log = ActivityLog(
+                user_id=self.user_id,
+                activity=activity,
+                date=self.date,
+                grid_position=position
+            )
+            try:
+                with transaction.atomic():
+                    log.save(sync_grid=False)
+            except IntegrityError:
+                log = ActivityLog.objects.get(
+                    user_id=self.user_id,
+                    activity=activity,
+                    date=self.date,
+                    grid_position=position
+                )
         
-        # Create activity log entry
-        ActivityLog.objects.create(
-            user=self.user,
-            activity=activity,
-            date=self.date,
-            grid_position=position
-        )
+        return log
+    
+    @classmethod
+    def log_activities(cls, user, taps):
+        """
+        Log many taps for a user in one transaction.
+        
+        ``taps`` is a list of dicts with ``date``, ``activity_id``,
+        ``position`` and an optional ``idempotency_key``; taps whose key was
+        already used are reported as duplicates. Activities are validated
+        with one query, each touched grid is written once and logs are bulk
+        created. Returns a ``(results, grids)`` tuple where ``results`` has
+        one entry per tap, in order, and ``grids`` are the touched grids.
+        """
+        from django.utils import timezone
+        from .signals import activity_logs_bulk_created
+        
+        dates = {tap['date'] for tap in taps}
+        
+        with transaction.atomic():
+            activities = Activity.objects.filter(
+                user=user,
+                is_active=True,
+                id__in={tap['activity_id'] for tap in taps}
+            ).in_bulk()
+            
+            grids = cls.objects.select_for_update().filter(user=user, date__in=dates)
+            grids_by_date = {grid.date: grid for grid in grids}
+            existing_grids = len(grids_by_date)
+            if existing_grids < len(dates):
+                cls.objects.bulk_create(
+                    [
+                        cls(user=user, date=grid_date, grid_size=user.default_grid_size)
+                        for grid_date in dates - grids_by_date.keys()
+                    ],
+                    ignore_conflicts=True
+                )
+                grids_by_date = {grid.date: grid for grid in grids.all()}
+            
+            logged = set(
+                ActivityLog.objects.filter(user=user, date__in=dates)
+                .values_list('activity_id', 'date', 'grid_position')
+            )
+            
+            keys = {tap['idempotency_key'] for tap in taps if tap.get('idempotency_key')}
+            used_keys = set(
+                ActivityLog.objects.filter(user=user, idempotency_key__in=keys)
+                .values_list('idempotency_key', flat=True)
+            ) if keys else set()
+            
+            results = []
+            logs = []
+            for index, tap in enumerate(taps):
+                result = {
+                    'index': index,
+                    'date': tap['date'],
+                    'activity_id': tap['activity_id'],
+                    'position': tap['position'],
+                }
+                results.append(result)
+                
+                grid = grids_by_date[tap['date']]
+                key = (tap['activity_id'], tap['date'], tap['position'])
+                idempotency_key = tap.get('idempotency_key') or None
+                if idempotency_key in used_keys:
+                    result.update(status='duplicate')
+                elif tap['activity_id'] not in activities:
+                    result.update(status='error', error='Activity not found')
+                elif not 0 <= tap['position'] < grid.grid_size:
+                    result.update(status='error', error='Invalid grid position')
+                elif key in logged:
+                    grid.cells[tap['position']] = tap['activity_id']
+                    result.update(status='duplicate')
+                else:
+                    grid.cells[tap['position']] = tap['activity_id']
+                    logged.add(key)
+                    if idempotency_key:
+                        used_keys.add(idempotency_key)
+                    logs.append((result, ActivityLog(
+                        user=user,
+                        activity=activities[tap['activity_id']],
+                        date=tap['date'],
+                        grid_position=tap['position'],
+                        idempotency_key=idempotency_key
+                    )))
+                    result.update(status='logged')
+            
+            touched = [
+                grids_by_date[grid_date]
+                for grid_date in sorted({result['date'] for result in results if result['status'] != 'error'})
+            ]
+            now = timezone.now()
+            for grid in touched:
+                grid.pack_cells()
+                grid.updated_at = now
+            cls.objects.bulk_update(touched, cls.CELL_FIELDS)
+            
+            created = ActivityLog.objects.bulk_create([log for _, log in logs])
+            for (result, _), log in zip(logs, created):
+                result['log_id'] = log.id
+            
+            if created:
+                activity_logs_bulk_created.send(
+                    sender=ActivityLog,
+                    user_id=user.id,
+                    logs=created,
+                    grids=touched,
+                    created_grids=len(grids_by_date) - existing_grids
+                )
+        
+        return results, touched
 
 
 class ActivityLog(models.Model):
@@ -189,26 +493,213 @@ class ActivityLog(models.Model):
     grid_position = models.IntegerField()
     logged_at = models.DateTimeField(auto_now_add=True)
     notes = models.TextField(blank=True)
+    idempotency_key = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        help_text=_('Client-generated key that makes offline tap uploads safe to retry')
+    )
     
     class Meta:
         verbose_name = _('Activity Log')
         verbose_name_plural = _('Activity Logs')
         ordering = ['-logged_at']
         unique_together = ['user', 'activity', 'date', 'grid_position']
+        indexes = [
+            models.Index(fields=['user', '-logged_at', '-id'], name='log_user_logged_at_cursor'),
+            models.Index(fields=['user', 'date', 'id'], name='log_user_date'),
+            models.Index(fields=['activity', 'date'], name='log_activity_date'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'idempotency_key'],
+                condition=models.Q(idempotency_key__isnull=False),
+                name='unique_log_idempotency_key'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.activity.name} on {self.date}"
     
-    def save(self, *args, **kwargs):
-        # Ensure the daily grid exists
-        daily_grid, created = DailyGrid.objects.get_or_create(
-            user=self.user,
-            date=self.date,
-            defaults={'grid_size': self.user.default_grid_size}
-        )
+    def save(self, *args, sync_grid=True, **kwargs):
+        """
+        Save the log, recording its position on the day's grid.
+        
+        Callers that have already written the grid, like
+        ``DailyGrid.log_activity``, pass ``sync_grid=False``.
+        """
+        if not sync_grid:
+            super().save(*args, **kwargs)
+            return
+        
+        with transaction.atomic():
+            # Ensure the daily grid exists and lock it against concurrent taps
+            daily_grid, created = DailyGrid.objects.select_for_update().get_or_create(
+                user_id=self.user_id,
+                date=self.date,
+                defaults={'grid_size': lambda: self.user.default_grid_size}
+            )
+            
+            # Update the grid's cells
+            daily_grid.cells[self.grid_position] = self.activity_id
+            daily_grid.save(update_fields=daily_grid.CELL_FIELDS)
+            
+            super().save(*args, **kwargs)
+
+
+class ActivityDayBitmap(models.Model):
+    """
+    Compact index of the days a user logged something.
+    
+    Rows with an activity cover that activity only; the row without one
+    covers all of the user's activities. See ``activities.bitmap``.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='day_bitmaps')
+    activity = models.ForeignKey(
+        Activity,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='day_bitmaps'
+    )
+    offset = models.IntegerField(default=0, help_text=_('Epoch day of the first bit'))
+    bits = models.BinaryField(default=bytes)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = _('Activity Day Bitmap')
+        verbose_name_plural = _('Activity Day Bitmaps')
+        unique_together = ['user', 'activity']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(activity__isnull=True),
+                name='unique_user_day_bitmap'
+            ),
+        ]
+    
+    def __str__(self):
+        scope = self.activity.name if self.activity_id else 'all activities'
+        return f"{self.user.username} - {scope} day bitmap"
+    
+    @property
+    def bitmap(self):
+        """Return the stored days as a ``DayBitmap``."""
+        return DayBitmap(self.offset, self.bits)
+    
+    @bitmap.setter
+    def bitmap(self, bitmap):
+        self.offset = bitmap.offset
+        self.bits = bytes(bitmap.bits)
+    
+    @classmethod
+    def _logged_dates(cls, user_id, activity_id):
+        logs = ActivityLog.objects.filter(user_id=user_id)
+        if activity_id is not None:
+            logs = logs.filter(activity_id=activity_id)
+        return logs.order_by().values_list('date', flat=True).distinct()
+    
+    @classmethod
+    def set_day(cls, user_id, activity_id, day):
+        """Mark a day as logged, building the row from logs if it is new."""
+        cls.set_days(user_id, activity_id, [day])
+    
+    @classmethod
+    def set_days(cls, user_id, activity_id, days):
+        """Mark several days as logged, building the row from logs if it is new."""
+        with transaction.atomic():
+            row, created = cls.objects.select_for_update().get_or_create(
+                user_id=user_id,
+                activity_id=activity_id
+            )
+            bitmap = DayBitmap.from_dates(cls._logged_dates(user_id, activity_id)) if created else row.bitmap
+            for day in days:
+                bitmap.add(day)
+            row.bitmap = bitmap
+            row.save(update_fields=['offset', 'bits', 'updated_at'])
+    
+    @classmethod
+    def clear_day(cls, user_id, activity_id, day):
+        """Mark a day as no longer logged."""
+        with transaction.atomic():
+            row = cls.objects.select_for_update().filter(
+                user_id=user_id,
+                activity_id=activity_id
+            ).first()
+            if row is None:
+                return
+            bitmap = row.bitmap
+            bitmap.discard(day)
+            row.bitmap = bitmap
+            row.save(update_fields=['offset', 'bits', 'updated_at'])
+    
+    @classmethod
+    def rebuild(cls, user_id):
+        """Rebuild all of a user's bitmaps from their logs."""
+        from collections import defaultdict
         
-        # Update the grid's activities_logged
-        daily_grid.activities_logged[str(self.grid_position)] = self.activity.id
-        daily_grid.save()
+        by_activity = defaultdict(DayBitmap)
+        overall = DayBitmap()
+        rows = (
+            ActivityLog.objects.filter(user_id=user_id)
+            .order_by()
+            .values_list('activity_id', 'date')
+            .distinct()
+        )
+        for activity_id, day in rows.iterator():
+            by_activity[activity_id].add(day)
+            overall.add(day)
         
-        super().save(*args, **kwargs) 
\ No newline at end of file
+        bitmaps = [cls(user_id=user_id, activity_id=None, offset=overall.offset, bits=bytes(overall.bits))]
+        bitmaps.extend(
+            cls(user_id=user_id, activity_id=activity_id, offset=bitmap.offset, bits=bytes(bitmap.bits))
+            for activity_id, bitmap in by_activity.items()
+        )
+        with transaction.atomic():
+            cls.objects.filter(user_id=user_id).delete()
+            cls.objects.bulk_create(bitmaps)
+        return len(bitmaps)
+
+
+class SyncChange(models.Model):
+    """
+    Append-only feed of changes to a user's activities, grids and logs.
+    
+    The auto-incrementing id is the cursor offline clients sync from.
+    """
+    KIND_ACTIVITY = 'activity'
+    KIND_GRID = 'grid'
+    KIND_LOG = 'log'
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sync_changes')
+    kind = models.CharField(
+        max_length=20,
+        choices=[
+            (KIND_ACTIVITY, 'Activity'),
+            (KIND_GRID, 'Daily Grid'),
+            (KIND_LOG, 'Activity Log'),
+        ]
+    )
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('Sync Change')
+        verbose_name_plural = _('Sync Changes')
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'id'], name='sync_change_user_cursor'),
+        ]
+    
+    def __str__(self):
+        action = 'deleted' if self.deleted else 'changed'
+        return f"{self.user_id} - {self.kind} {self.object_id} {action}"
+    
+    @classmethod
+    def record(cls, user_id, kind, object_ids, deleted=False):
+        """Append one change per object id."""
+        cls.objects.bulk_create([
+            cls(user_id=user_id, kind=kind, object_id=object_id, deleted=deleted)
+            for object_id in object_ids
+        ])
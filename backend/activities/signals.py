@@ -0,0 +1,165 @@
+"""
+Signal handlers that keep activity indexes and the sync feed in step with writes.
+"""
+
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .models import Activity, ActivityDayBitmap, ActivityLog, DailyGrid, SyncChange
+
+# Sent after logs are written with bulk_create, which skips post_save.
+# Receivers get ``user_id``, the created ``logs``, the touched ``grids`` and
+# ``created_grids``, the number of grids the batch had to create.
+activity_logs_bulk_created = Signal()
+
+# Sent once after a history import has bulk-written a user's activities, grids
+# and logs. Receivers get ``user_id`` and rebuild whatever they derive from them.
+history_imported = Signal()
+
+# Sent once per user, after commit, when a cascade or queryset delete removed
+# logs. Receivers get ``user_id``, the deleted ``log_ids`` and their ``dates``;
+# the per-log post_delete handlers skip such deletes.
+activity_logs_bulk_deleted = Signal()
+
+
+def is_bulk_delete(instance, origin):
+    """Return whether an object is deleted by a cascade or a queryset delete."""
+    return origin is not None and origin is not instance
+
+
+def _deletes_user(origin):
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return issubclass(model, get_user_model())
+
+
+@receiver(post_save, sender=ActivityLog)
+def index_log_day(sender, instance, created, raw=False, **kwargs):
+    """Set the log's day in the activity and user day bitmaps."""
+    if not created or raw:
+        return
+    
+    ActivityDayBitmap.set_day(instance.user_id, instance.activity_id, instance.date)
+    ActivityDayBitmap.set_day(instance.user_id, None, instance.date)
+
+
+@receiver(post_delete, sender=ActivityLog)
+def unindex_log_day(sender, instance, origin=None, **kwargs):
+    """Clear the log's day from the day bitmaps once nothing else covers it."""
+    if is_bulk_delete(instance, origin):
+        return
+    
+    day_logs = ActivityLog.objects.filter(user_id=instance.user_id, date=instance.date)
+    
+    if not day_logs.filter(activity_id=instance.activity_id).exists():
+        ActivityDayBitmap.clear_day(instance.user_id, instance.activity_id, instance.date)
+    if not day_logs.exists():
+        ActivityDayBitmap.clear_day(instance.user_id, None, instance.date)
+
+
+@receiver(activity_logs_bulk_created)
+def index_bulk_log_days(sender, user_id, logs, **kwargs):
+    """Set the days of bulk-created logs in the day bitmaps."""
+    days_by_activity = defaultdict(set)
+    for log in logs:
+        days_by_activity[log.activity_id].add(log.date)
+    
+    for activity_id, days in days_by_activity.items():
+        ActivityDayBitmap.set_days(user_id, activity_id, days)
+    ActivityDayBitmap.set_days(user_id, None, {log.date for log in logs})
+
+
+@receiver(post_delete, sender=ActivityLog)
+def gather_bulk_deleted_log(sender, instance, origin=None, **kwargs):
+    """
+    Collect logs removed by a cascade or queryset delete.
+    
+    Deleting an activity removes its logs one post_delete at a time; they are
+    gathered on the delete's origin and announced with one
+    ``activity_logs_bulk_deleted`` per user once the delete commits.
+    """
+    if not is_bulk_delete(instance, origin) or _deletes_user(origin):
+        return
+    
+    deleted = getattr(origin, '_deleted_logs', None)
+    if deleted is None:
+        deleted = origin._deleted_logs = defaultdict(lambda: ([], set()))
+        transaction.on_commit(lambda: _send_bulk_deleted(deleted))
+    log_ids, dates = deleted[instance.user_id]
+    log_ids.append(instance.pk)
+    dates.add(instance.date)
+
+
+def _send_bulk_deleted(deleted):
+    for user_id, (log_ids, dates) in deleted.items():
+        activity_logs_bulk_deleted.send(
+            sender=ActivityLog,
+            user_id=user_id,
+            log_ids=log_ids,
+            dates=dates
+        )
+
+
+@receiver(activity_logs_bulk_deleted)
+def unindex_bulk_deleted_logs(sender, user_id, **kwargs):
+    """Rebuild the user's day bitmaps once after a bulk delete."""
+    ActivityDayBitmap.rebuild(user_id)
+
+
+@receiver(history_imported)
+def rebuild_imported_day_bitmaps(sender, user_id, **kwargs):
+    """Rebuild the user's day bitmaps after a history import."""
+    ActivityDayBitmap.rebuild(user_id)
+
+
+SYNC_KINDS = {
+    Activity: SyncChange.KIND_ACTIVITY,
+    DailyGrid: SyncChange.KIND_GRID,
+    ActivityLog: SyncChange.KIND_LOG,
+}
+
+
+def record_sync_change(sender, instance, raw=False, origin=None, **kwargs):
+    """Append a saved or deleted object to the user's sync feed."""
+    if raw or (origin is not None and _deletes_user(origin)):
+        # Nothing to sync once the user itself is being deleted
+        return
+    if sender is ActivityLog and is_bulk_delete(instance, origin):
+        # Recorded in one insert by record_bulk_deleted_sync_changes
+        return
+    SyncChange.record(
+        instance.user_id,
+        SYNC_KINDS[sender],
+        [instance.pk],
+        deleted=kwargs['signal'] is post_delete
+    )
+
+
+for model in SYNC_KINDS:
+    post_save.connect(record_sync_change, sender=model, dispatch_uid=f'sync-save-{model.__name__}')
+    post_delete.connect(record_sync_change, sender=model, dispatch_uid=f'sync-delete-{model.__name__}')
+
+
+@receiver(activity_logs_bulk_created)
+def record_bulk_sync_changes(sender, user_id, logs, grids, **kwargs):
+    """Append bulk-created logs and their grids to the user's sync feed."""
+    SyncChange.record(user_id, SyncChange.KIND_GRID, [grid.pk for grid in grids])
+    SyncChange.record(user_id, SyncChange.KIND_LOG, [log.pk for log in logs])
+
+
+@receiver(activity_logs_bulk_deleted)
+def record_bulk_deleted_sync_changes(sender, user_id, log_ids, **kwargs):
+    """Append logs removed by a bulk delete to the user's sync feed."""
+    SyncChange.record(user_id, SyncChange.KIND_LOG, log_ids, deleted=True)
+
+
+def compact_legacy_grids(sender, verbosity=1, **kwargs):
+    """Convert grids still holding legacy JSON contents whenever migrations run."""
+    from django.core.management import call_command
+    
+    if DailyGrid.objects.exclude(legacy_activities_logged={}).exists():
+        call_command('compact_grid_storage', verbosity=verbosity)
\ No newline at end of file
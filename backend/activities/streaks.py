@@ -0,0 +1,101 @@
+"""
+Streak calculations for activities and users.
+
+Streaks are worked out from a single ordered scan of distinct active dates
+instead of probing the database one day at a time. Any queryset with ``date``
+and ``activity_id`` columns can be scanned; callers pass the daily rollups.
+Single activity and user lookups read the day bitmap index when one exists.
+"""
+
+from datetime import date, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from .bitmap import DayBitmap
+
+
+def calculate_streaks(dates, today=None):
+    """
+    Return ``(current_streak, longest_streak)`` for ascending, distinct dates.
+
+    The current streak is the run of consecutive days ending today; it is
+    zero when nothing was logged today. Dates after today, such as a log
+    written by a client with a skewed clock, count towards the longest
+    streak but never reset the current one.
+    """
+    today = today or date.today()
+    current_streak = 0
+    longest_streak = 0
+    run = 0
+    previous_date = None
+
+    for activity_date in dates:
+        if previous_date is not None and activity_date - previous_date == timedelta(days=1):
+            run += 1
+        else:
+            run = 1
+        longest_streak = max(longest_streak, run)
+        if activity_date == today:
+            current_streak = run
+        previous_date = activity_date
+
+    return current_streak, longest_streak
+
+
+def get_streaks(rows, today=None):
+    """Return ``(current_streak, longest_streak)`` for a queryset of dated rows."""
+    dates = (
+        rows.order_by('date')
+        .values_list('date', flat=True)
+        .distinct()
+    )
+    return calculate_streaks(dates, today=today)
+
+
+def get_streaks_by_activity(rows, today=None):
+    """
+    Return ``{activity_id: (current_streak, longest_streak)}`` for a queryset
+    of dated rows, using one query grouped by activity.
+
+    Activities without any logs are absent from the result.
+    """
+    dated_rows = (
+        rows.order_by('activity_id', 'date')
+        .values_list('activity_id', 'date')
+        .distinct()
+    )
+    return {
+        activity_id: calculate_streaks(
+            (activity_date for _, activity_date in activity_rows),
+            today=today
+        )
+        for activity_id, activity_rows in groupby(dated_rows, key=itemgetter(0))
+    }
+
+
+def get_activity_streaks(activity, today=None):
+    """
+    Return ``(current_streak, longest_streak)`` for a single activity.
+
+    Activities loaded with ``with_day_bitmaps()`` are answered from the
+    annotated bitmap without a query; one that was also annotated with
+    ``with_log_counts()`` and has no logs is known to have no streaks.
+    """
+    if hasattr(activity, 'day_bitmap_bits'):
+        if activity.day_bitmap_bits is not None:
+            return DayBitmap(activity.day_bitmap_offset, activity.day_bitmap_bits).streaks(today)
+        if getattr(activity, 'total_log_count', None) == 0:
+            return 0, 0
+
+    index = activity.day_bitmaps.first()
+    if index is not None:
+        return index.bitmap.streaks(today)
+    return get_streaks(activity.daily_rollups.all(), today=today)
+
+
+def get_user_streaks(user, today=None):
+    """Return ``(current_streak, longest_streak)`` across all of a user's activities."""
+    index = user.day_bitmaps.filter(activity__isnull=True).first()
+    if index is not None:
+        return index.bitmap.streaks(today)
+    return get_streaks(user.daily_rollups.all(), today=today)
@@ -0,0 +1,71 @@
+"""
+Delta sync for offline clients.
+
+Every write appends a ``SyncChange`` row, so a client that remembers the last
+change id it saw can fetch only what changed since then.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Activity, ActivityLog, DailyGrid, SyncChange
+
+SYNC_MODELS = {
+    SyncChange.KIND_ACTIVITY: Activity,
+    SyncChange.KIND_GRID: DailyGrid,
+    SyncChange.KIND_LOG: ActivityLog,
+}
+
+
+def changes_since(user, cursor=0, limit=None):
+    """
+    Return the objects a user changed after ``cursor``.
+
+    The result holds ``cursor`` (pass it back on the next call), ``has_more``,
+    ``changed`` (kind to a queryset of current objects) and ``deleted`` (kind
+    to a list of ids). Ids are handed out before commit, so a slower
+    transaction can still land below the newest id; the returned cursor stays
+    before changes younger than ``SYNC_SETTLE_SECONDS`` and those are sent
+    again next time, which is harmless because clients apply them as upserts.
+    """
+    limit = limit or settings.SYNC_PAGE_SIZE
+    settled_before = timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    
+    rows = list(
+        SyncChange.objects.filter(user=user, id__gt=cursor)
+        .order_by('id')
+        .values_list('id', 'kind', 'object_id', 'deleted', 'created_at')[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    latest = {}
+    next_cursor = cursor
+    for change_id, kind, object_id, deleted, created_at in rows:
+        latest[kind, object_id] = deleted
+        if created_at <= settled_before:
+            next_cursor = change_id
+    if has_more and next_cursor == cursor:
+        # A full page of unsettled changes must still move the cursor forward
+        next_cursor = rows[-1][0]
+    
+    changed_ids = {kind: set() for kind in SYNC_MODELS}
+    deleted = {kind: [] for kind in SYNC_MODELS}
+    for (kind, object_id), was_deleted in latest.items():
+        if was_deleted:
+            deleted[kind].append(object_id)
+        else:
+            changed_ids[kind].add(object_id)
+    
+    changed = {
+        kind: SYNC_MODELS[kind].objects.filter(user=user, id__in=ids).order_by('id')
+        for kind, ids in changed_ids.items()
+    }
+    return {
+        'cursor': next_cursor,
+        'has_more': has_more,
+        'changed': changed,
+        'deleted': deleted,
+    }
@@ -0,0 +1,104 @@
+"""
+Celery tasks for activities.
+"""
+
+import logging
+import os
+import socket
+import uuid
+
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+
+from core import locks
+from . import export, importer, write_behind
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+FLUSH_LOCK_KEY = 'grid-taps:flush-lock:{}'
+
+
+@shared_task
+def flush_grid_taps():
+    """
+    Write every user's buffered grid taps to the database.
+    
+    A per-user lock keeps one worker flushing a user at a time so taps on the
+    same cell are applied in order. It outlives the reclaim idle time and is
+    renewed after every batch, so a slow flush keeps its entries instead of
+    another worker reclaiming and applying them again.
+    """
+    if not write_behind.is_enabled():
+        return 0
+    
+    consumer = f'{socket.gethostname()}-{os.getpid()}'
+    batch_size = settings.GRID_WRITE_BEHIND_BATCH_SIZE
+    lock_timeout = settings.GRID_WRITE_BEHIND_CLAIM_IDLE * 2
+    user_ids = write_behind.pending_users()
+    users = User.objects.in_bulk(user_ids)
+    
+    flushed = 0
+    for user_id in user_ids:
+        user = users.get(user_id)
+        if user is None:
+            write_behind.discard_user(user_id)
+            continue
+        
+        lock_key = FLUSH_LOCK_KEY.format(user_id)
+        token = uuid.uuid4().hex
+        if not locks.acquire(lock_key, token, lock_timeout):
+            continue
+        try:
+            while True:
+                processed = write_behind.flush_user(user, consumer, batch_size)
+                flushed += processed
+                if processed < batch_size:
+                    break
+                if not locks.renew(lock_key, token, lock_timeout):
+                    logger.warning('Lost the flush lock for user %s', user_id)
+                    break
+        except Exception:
+            # Unacknowledged entries are reclaimed on a later run
+            logger.exception('Failed to flush buffered taps for user %s', user_id)
+        finally:
+            locks.release(lock_key, token)
+    
+    return flushed
+
+
+@shared_task
+def export_history(user_id, kind, export_format):
+    """Write a user's full ``logs`` or ``grids`` export to storage and return its name."""
+    user = User.objects.get(pk=user_id)
+    return export.write_export(user, kind, export_format)
+
+
+@shared_task(bind=True)
+def import_history(self, user_id, name, import_format):
+    """
+    Import an uploaded history file from storage, reporting progress.
+    
+    The task state is ``PROGRESS`` with the running report while batches are
+    written; the upload is deleted once the import finishes or fails.
+    """
+    user = User.objects.get(pk=user_id)
+    try:
+        with default_storage.open(name, 'rb') as upload:
+            total_bytes = upload.size
+            
+            def report_progress(report):
+                self.update_state(state='PROGRESS', meta={
+                    'user_id': user_id,
+                    'bytes_read': upload.tell(),
+                    'total_bytes': total_bytes,
+                    **report,
+                })
+            
+            report = importer.import_history(user, upload, import_format, progress=report_progress)
+    finally:
+        default_storage.delete(name)
+    return {'user_id': user_id, **report}
\ No newline at end of file
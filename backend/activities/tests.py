@@ -0,0 +1,101 @@
+"""
+Tests for the activities app.
+"""
+
+import random
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from .bitmap import DayBitmap
+from .models import Activity, ActivityDayBitmap, ActivityLog, DailyGrid
+from .streaks import calculate_streaks
+
+User = get_user_model()
+
+SEEDS = range(8)
+
+
+class DayBitmapPropertyTests(TestCase):
+    """
+    Random log histories, written and deleted through the normal write paths,
+    must leave the day bitmaps answering like the ORM-based calculations.
+    """
+
+    def setUp(self):
+        self.today = date.today()
+
+    def write_history(self, rng, user, activities):
+        """Log random taps through both write paths, then delete some logs."""
+        taps = [
+            {
+                'date': self.today - timedelta(days=rng.randrange(-3, 120)),
+                'activity_id': rng.choice(activities).id,
+                'position': rng.randrange(16),
+            }
+            for _ in range(rng.randrange(20, 120))
+        ]
+        DailyGrid.log_activities(user, taps[len(taps) // 2:])
+        for tap in taps[:len(taps) // 2]:
+            grid, _ = DailyGrid.objects.get_or_create(user=user, date=tap['date'])
+            grid.log_activity(Activity.objects.get(pk=tap['activity_id']), tap['position'])
+
+        logs = list(ActivityLog.objects.filter(user=user).values_list('id', flat=True))
+        log_dates = sorted(set(ActivityLog.objects.filter(user=user).values_list('date', flat=True)))
+        for log_id in rng.sample(logs, len(logs) // 10):
+            ActivityLog.objects.get(pk=log_id).delete()
+        # Bulk deletes are indexed once the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            ActivityLog.objects.filter(user=user, date=rng.choice(log_dates)).delete()
+
+    def orm_dates(self, user, activity=None):
+        logs = ActivityLog.objects.filter(user=user)
+        if activity is not None:
+            logs = logs.filter(activity=activity)
+        return sorted(set(logs.values_list('date', flat=True)))
+
+    def assert_matches_orm(self, bitmap, dates):
+        self.assertEqual(list(bitmap.dates()), dates)
+        self.assertEqual(bitmap.streaks(self.today), calculate_streaks(dates, self.today))
+        self.assertEqual(len(bitmap), len(dates))
+
+        start, end = self.today - timedelta(days=30), self.today
+        in_range = [day for day in dates if start <= day <= end]
+        self.assertEqual(bitmap.count_between(start, end), len(in_range))
+        self.assertAlmostEqual(bitmap.consistency(start, end), len(in_range) / 31 * 100)
+        self.assertEqual(
+            bitmap.heatmap(start, end),
+            [int(start + timedelta(days=i) in in_range) for i in range(31)]
+        )
+
+    def assert_all_match_orm(self, user, activities):
+        rows = {row.activity_id: row.bitmap for row in ActivityDayBitmap.objects.filter(user=user)}
+        self.assert_matches_orm(rows.get(None, DayBitmap()), self.orm_dates(user))
+        for activity in activities:
+            self.assert_matches_orm(rows.get(activity.id, DayBitmap()), self.orm_dates(user, activity))
+
+    def test_bitmaps_match_orm_for_random_histories(self):
+        for seed in SEEDS:
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                user = User.objects.create_user(f'bitmap-{seed}', password='unused')
+                activities = [
+                    Activity.objects.create(user=user, name=f'Activity {i}')
+                    for i in range(3)
+                ]
+                self.write_history(rng, user, activities)
+                self.assert_all_match_orm(user, activities)
+
+    def test_rebuild_matches_orm_after_activity_delete(self):
+        rng = random.Random(100)
+        user = User.objects.create_user('bitmap-rebuild', password='unused')
+        activities = [Activity.objects.create(user=user, name=f'Activity {i}') for i in range(3)]
+        self.write_history(rng, user, activities)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            activities.pop().delete()
+        self.assert_all_match_orm(user, activities)
+
+        ActivityDayBitmap.rebuild(user.id)
+        self.assert_all_match_orm(user, activities)
\ No newline at end of file
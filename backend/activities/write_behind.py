@@ -0,0 +1,241 @@
+"""
+Write-behind buffer for grid taps.
+
+With ``GRID_WRITE_BEHIND`` on, a tap is appended to a per-user Redis stream
+and acknowledged straight away; the ``flush_grid_taps`` task later writes the
+buffered taps through ``DailyGrid.log_activities`` in batches.
+
+Entries are read through a consumer group and only acknowledged and deleted
+once the database transaction has committed. Entries left pending by a
+crashed worker are reclaimed after ``GRID_WRITE_BEHIND_CLAIM_IDLE`` seconds
+and replayed; each carries an idempotency key derived from its stream id, so
+a tap that was already written comes back as a duplicate. An entry delivered
+more than ``GRID_WRITE_BEHIND_MAX_DELIVERIES`` times is moved to the
+``grid-taps:dead-letter`` stream instead of being retried forever.
+
+Taps that are malformed or rejected when written (the activity was deleted,
+the position no longer fits the grid) go to the same dead-letter stream with
+their error, and the rejected day's grid is recorded in the sync feed so an
+offline client that already showed the tap pulls the server's grid.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY = 'grid-taps:{}'
+USERS_KEY = 'grid-taps:users'
+DEAD_LETTER_KEY = 'grid-taps:dead-letter'
+GROUP = 'grid-flush'
+
+# Only forget a user while their stream is still empty
+RELEASE_USER_SCRIPT = """
+if redis.call('XLEN', KEYS[1]) == 0 then
+    return redis.call('SREM', KEYS[2], ARGV[1])
+end
+return 0
+"""
+
+
+def is_enabled():
+    """Return whether taps should be buffered instead of written directly."""
+    return settings.GRID_WRITE_BEHIND
+
+
+@lru_cache(maxsize=None)
+def get_client():
+    """Return a shared Redis client for the tap buffer."""
+    return redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+
+def buffer_tap(grid, activity, position):
+    """Append a tap to the user's stream, returning its entry id."""
+    if not 0 <= position < grid.grid_size:
+        raise ValueError("Invalid grid position")
+    
+    pipe = get_client().pipeline()
+    pipe.xadd(STREAM_KEY.format(grid.user_id), {
+        'date': grid.date.isoformat(),
+        'activity_id': activity.id,
+        'position': position,
+    })
+    pipe.sadd(USERS_KEY, grid.user_id)
+    entry_id, _ = pipe.execute()
+    return entry_id
+
+
+def pending_users():
+    """Return the ids of users with buffered taps."""
+    return [int(user_id) for user_id in get_client().smembers(USERS_KEY)]
+
+
+def discard_user(user_id):
+    """Drop a user's buffered taps without writing them."""
+    pipe = get_client().pipeline()
+    pipe.delete(STREAM_KEY.format(user_id))
+    pipe.srem(USERS_KEY, user_id)
+    pipe.execute()
+
+
+def stream_version(user_id):
+    """Return the id of the user's newest buffered tap, or '' if none are pending."""
+    entries = get_client().xrevrange(STREAM_KEY.format(user_id), count=1)
+    return entries[0][0] if entries else ''
+
+
+def pending_taps(user_id):
+    """Return a user's unflushed taps as ``(position, activity_id)`` lists keyed by ISO date."""
+    pending = defaultdict(list)
+    for _, fields in get_client().xrange(STREAM_KEY.format(user_id)):
+        pending[fields['date']].append((int(fields['position']), int(fields['activity_id'])))
+    return pending
+
+
+def apply_pending(grid, pending):
+    """Apply the taps from ``pending_taps`` that fall on an in-memory grid's day."""
+    for position, activity_id in pending.get(grid.date.isoformat(), ()):
+        if position < grid.grid_size:
+            grid.cells[position] = activity_id
+
+
+def merge_pending(user_id, grids):
+    """Apply a user's unflushed taps to in-memory grids so reads see them."""
+    grids = [grid for grid in grids if grid is not None]
+    if not grids:
+        return
+    
+    pending = pending_taps(user_id)
+    for grid in grids:
+        apply_pending(grid, pending)
+
+
+def _parse_tap(entry_id, fields):
+    return {
+        'date': date.fromisoformat(fields['date']),
+        'activity_id': int(fields['activity_id']),
+        'position': int(fields['position']),
+        'idempotency_key': f'tap:{entry_id}',
+    }
+
+
+def _dead_letter(client, stream, consumer, user_id, entries):
+    """Move reclaimed entries delivered too often to the dead-letter stream, returning the rest."""
+    live = [(entry_id, fields) for entry_id, fields in entries if fields]
+    if not live:
+        return entries
+    
+    pending = client.xpending_range(
+        stream, GROUP,
+        min=live[0][0], max=live[-1][0],
+        count=len(live),
+        consumername=consumer
+    )
+    deliveries = {row['message_id']: row['times_delivered'] for row in pending}
+    dead = [
+        (entry_id, fields) for entry_id, fields in live
+        if deliveries.get(entry_id, 0) > settings.GRID_WRITE_BEHIND_MAX_DELIVERIES
+    ]
+    if not dead:
+        return entries
+    
+    dead_ids = [entry_id for entry_id, _ in dead]
+    pipe = client.pipeline()
+    for entry_id, fields in dead:
+        pipe.xadd(DEAD_LETTER_KEY, {**fields, 'user_id': user_id, 'entry_id': entry_id})
+    pipe.xack(stream, GROUP, *dead_ids)
+    pipe.xdel(stream, *dead_ids)
+    pipe.execute()
+    logger.error(
+        'Moved %d buffered taps for user %s to %s after more than %d deliveries',
+        len(dead_ids), user_id, DEAD_LETTER_KEY, settings.GRID_WRITE_BEHIND_MAX_DELIVERIES
+    )
+    dead_ids = set(dead_ids)
+    return [entry for entry in entries if entry[0] not in dead_ids]
+
+
+def flush_user(user, consumer, count=None):
+    """
+    Write one batch of a user's buffered taps.
+    
+    Stale entries pending on other consumers are reclaimed first, dropping
+    any that have been delivered too often, then new entries are read.
+    Malformed and rejected taps are dead-lettered rather than dropped.
+    Returns the number of stream entries processed, dead-lettered included.
+    """
+    from .models import DailyGrid, SyncChange
+    
+    count = count or settings.GRID_WRITE_BEHIND_BATCH_SIZE
+    client = get_client()
+    stream = STREAM_KEY.format(user.id)
+    try:
+        client.xgroup_create(stream, GROUP, id='0', mkstream=True)
+    except redis.ResponseError as exc:
+        if 'BUSYGROUP' not in str(exc):
+            raise
+    
+    claimed = client.xautoclaim(
+        stream, GROUP, consumer,
+        min_idle_time=settings.GRID_WRITE_BEHIND_CLAIM_IDLE * 1000,
+        count=count
+    )[1]
+    processed = len(claimed)
+    entries = _dead_letter(client, stream, consumer, user.id, claimed)
+    if processed < count:
+        for _, stream_entries in client.xreadgroup(GROUP, consumer, {stream: '>'}, count=count - processed):
+            entries.extend(stream_entries)
+            processed += len(stream_entries)
+    
+    if not processed:
+        client.eval(RELEASE_USER_SCRIPT, 2, stream, USERS_KEY, user.id)
+        return 0
+    if not entries:
+        return processed
+    
+    taps = []
+    parsed = []
+    rejected = []
+    for entry_id, fields in entries:
+        if not fields:
+            continue
+        try:
+            taps.append(_parse_tap(entry_id, fields))
+            parsed.append((entry_id, fields))
+        except (KeyError, ValueError):
+            rejected.append((entry_id, fields, 'Malformed tap'))
+    
+    if taps:
+        with transaction.atomic():
+            results, _ = DailyGrid.log_activities(user, taps)
+            errors = [result for result in results if result['status'] == 'error']
+            if errors:
+                rejected.extend(
+                    (*parsed[result['index']], result['error'])
+                    for result in errors
+                )
+                # Rejected taps leave their grids unchanged, so point clients
+                # that showed them optimistically at the server's copy
+                SyncChange.record(user.id, SyncChange.KIND_GRID, DailyGrid.objects.filter(
+                    user=user,
+                    date__in={result['date'] for result in errors}
+                ).values_list('pk', flat=True))
+    
+    entry_ids = [entry_id for entry_id, _ in entries]
+    pipe = client.pipeline()
+    for entry_id, fields, error in rejected:
+        pipe.xadd(DEAD_LETTER_KEY, {**fields, 'user_id': user.id, 'entry_id': entry_id, 'error': error})
+    pipe.xack(stream, GROUP, *entry_ids)
+    pipe.xdel(stream, *entry_ids)
+    pipe.execute()
+    if rejected:
+        logger.warning(
+            'Moved %d rejected buffered taps for user %s to %s',
+            len(rejected), user.id, DEAD_LETTER_KEY
+        )
+    return processed
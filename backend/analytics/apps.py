@@ -0,0 +1,14 @@
+"""
+App configuration for analytics app.
+"""
+
+from django.apps import AppConfig
+
+
+class AnalyticsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'analytics'
+    verbose_name = 'Analytics'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,115 @@
+"""
+Cached year heatmaps of daily grid completion.
+
+Each user's year is cached as a byte string of one 0-100 intensity per day,
+under a per-year version number. Grid writes bump the version of the year
+they touch once their transaction commits, so a rolled-back write leaves the
+cache alone and a reader that built the year from older data stores it under
+a version nobody reads any more.
+
+A write invalidates its whole year rather than patching the one day in the
+cached bytes: patching is a read-modify-write that concurrent taps could
+interleave, while rebuilding a year is one indexed query over at most 366
+narrow grid rows on the next read.
+"""
+
+import base64
+import time
+from datetime import date
+from itertools import groupby
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'heatmap:version:{user_id}:{year}'
+CACHE_KEY = 'heatmap:{user_id}:{year}:{version}'
+
+ENCODINGS = ('list', 'base64', 'rle')
+
+
+def _get_version(user_id, year):
+    key = VERSION_KEY.format(user_id=user_id, year=year)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so an evicted version key cannot land back on
+        # a version that still has an entry
+        cache.add(key, time.time_ns() // 1000, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _days_in_year(year):
+    return (date(year + 1, 1, 1) - date(year, 1, 1)).days
+
+
+def grid_intensity(grid):
+    """Return a grid's completion as a whole-number intensity from 0 to 100."""
+    return round(grid.completion_percentage)
+
+
+def build_year(user_id, year):
+    """Build a year's intensities from the user's grids."""
+    from activities.models import DailyGrid
+    
+    start = date(year, 1, 1)
+    intensities = bytearray(_days_in_year(year))
+    grids = DailyGrid.objects.filter(
+        user_id=user_id,
+        date__year=year
+    ).only('date', 'grid_size', 'filled_count')
+    
+    for grid in grids:
+        intensities[(grid.date - start).days] = grid_intensity(grid)
+    return bytes(intensities)
+
+
+def get_year(user_id, year):
+    """Return a year's intensities as bytes, building and caching them on a miss."""
+    # Read the version before the grids so a write committing in between
+    # orphans what is built here
+    key = CACHE_KEY.format(user_id=user_id, year=year, version=_get_version(user_id, year))
+    intensities = cache.get(key)
+    if intensities is None:
+        intensities = build_year(user_id, year)
+        cache.set(key, intensities, settings.HEATMAP_CACHE_TIMEOUT)
+    return intensities
+
+
+def invalidate_years(user_id, years):
+    """Orphan the cached years once the current transaction commits."""
+    def bump():
+        for year in years:
+            key = VERSION_KEY.format(user_id=user_id, year=year)
+            try:
+                cache.incr(key)
+            except ValueError:
+                # Nothing was cached under this year yet
+                pass
+    
+    transaction.on_commit(bump)
+
+
+def invalidate_year(user_id, year):
+    """Orphan a cached year once the current transaction commits."""
+    invalidate_years(user_id, [year])
+
+
+def drop_user(user_id):
+    """Orphan every cached year spanned by a user's grids."""
+    from django.db.models import Max, Min
+    from activities.models import DailyGrid
+    
+    span = DailyGrid.objects.filter(user_id=user_id).aggregate(first=Min('date'), last=Max('date'))
+    if span['first'] is None:
+        return
+    invalidate_years(user_id, range(span['first'].year, span['last'].year + 1))
+
+
+def encode(intensities, encoding='list'):
+    """Encode intensities as a list, base64 string or ``[value, run]`` pairs."""
+    if encoding == 'base64':
+        return base64.b64encode(intensities).decode('ascii')
+    if encoding == 'rle':
+        return [[value, len(list(run))] for value, run in groupby(intensities)]
+    return list(intensities)
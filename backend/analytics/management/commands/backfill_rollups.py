@@ -0,0 +1,38 @@
+"""
+Backfill DailyActivityRollup rows from raw activity logs.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from analytics.models import DailyActivityRollup
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-day activity rollup table from ActivityLog rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            dest='usernames',
+            action='append',
+            default=[],
+            help='Only backfill rollups for this username (repeatable).',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+
+        total_users = 0
+        total_rows = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            total_rows += DailyActivityRollup.rebuild(user_id=user_id)
+            total_users += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfilled {total_rows} rollup rows for {total_users} users.'
+        ))
@@ -0,0 +1,72 @@
+"""
+Rebuild UserAnalytics rows from scratch.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from analytics.models import UserAnalytics
+
+User = get_user_model()
+
+AUDITED_FIELDS = [
+    'total_activities_logged',
+    'total_days_tracked',
+    'longest_streak',
+    'current_streak',
+    'last_activity_date',
+]
+
+
+class Command(BaseCommand):
+    help = 'Recompute UserAnalytics from activity logs and grids, reporting any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            dest='usernames',
+            action='append',
+            default=[],
+            help='Only rebuild analytics for this username (repeatable).',
+        )
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Report drift without saving the recomputed values.',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('id')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+
+        checked = 0
+        drifted = 0
+        for user in users.iterator():
+            with transaction.atomic():
+                analytics, _ = UserAnalytics.objects.select_for_update().get_or_create(user=user)
+                before = {field: getattr(analytics, field) for field in AUDITED_FIELDS}
+
+                analytics.update_analytics()
+
+                changes = {
+                    field: (value, getattr(analytics, field))
+                    for field, value in before.items()
+                    if value != getattr(analytics, field)
+                }
+                if changes:
+                    drifted += 1
+                    details = ', '.join(
+                        f'{field}: {old} -> {new}' for field, (old, new) in changes.items()
+                    )
+                    self.stdout.write(self.style.WARNING(f'{user.username}: {details}'))
+
+                if options['check']:
+                    transaction.set_rollback(True)
+            checked += 1
+
+        action = 'Checked' if options['check'] else 'Rebuilt'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} analytics for {checked} users ({drifted} drifted).'
+        ))
@@ -2,21 +2,117 @@
 Analytics models for tracking user patterns and insights.
 """
 
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Avg, Count, F, Max, Min, Sum, Value
+from django.db.models.functions import Greatest, Least
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 
 User = get_user_model()
 
 
+class DailyActivityRollup(models.Model):
+    """
+    Per-day summary of a user's logs for one activity.
+    
+    Analytics read from this table instead of raw ``ActivityLog`` rows, so
+    their cost follows the number of active days rather than tap volume.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_rollups')
+    activity = models.ForeignKey('activities.Activity', on_delete=models.CASCADE, related_name='daily_rollups')
+    date = models.DateField()
+    log_count = models.IntegerField(default=0)
+    first_logged_at = models.DateTimeField()
+    last_logged_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = _('Daily Activity Rollup')
+        verbose_name_plural = _('Daily Activity Rollups')
+        unique_together = ['user', 'activity', 'date']
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['user', 'date'], name='rollup_user_date'),
+            models.Index(fields=['activity', 'date'], name='rollup_activity_date'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.activity.name} on {self.date} ({self.log_count})"
+    
+    @classmethod
+    def record_log(cls, log):
+        """Add a newly created log to its day's rollup."""
+        bucket = cls.objects.filter(
+            user_id=log.user_id,
+            activity_id=log.activity_id,
+            date=log.date
+        )
+        updated = bucket.update(
+            log_count=F('log_count') + 1,
+            first_logged_at=Least('first_logged_at', Value(log.logged_at)),
+            last_logged_at=Greatest('last_logged_at', Value(log.logged_at)),
+        )
+        if updated:
+            return
+        
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    user_id=log.user_id,
+                    activity_id=log.activity_id,
+                    date=log.date,
+                    log_count=1,
+                    first_logged_at=log.logged_at,
+                    last_logged_at=log.logged_at,
+                )
+        except IntegrityError:
+            # Another writer created the row first
+            cls.record_log(log)
+    
+    @classmethod
+    def rebuild(cls, user_id=None, dates=None):
+        """Rebuild rollups from raw logs, optionally for one user and some dates."""
+        from activities.models import ActivityLog
+        
+        logs = ActivityLog.objects.all()
+        rollups = cls.objects.all()
+        if user_id is not None:
+            logs = logs.filter(user_id=user_id)
+            rollups = rollups.filter(user_id=user_id)
+        if dates is not None:
+            logs = logs.filter(date__in=dates)
+            rollups = rollups.filter(date__in=dates)
+        
+        rows = (
+            logs.order_by()
+            .values('user_id', 'activity_id', 'date')
+            .annotate(
+                log_count=Count('id'),
+                first_logged_at=Min('logged_at'),
+                last_logged_at=Max('logged_at'),
+            )
+        )
+        
+        with transaction.atomic():
+            rollups.delete()
+            created = cls.objects.bulk_create(
+                (cls(**row) for row in rows.iterator()),
+                batch_size=1000
+            )
+        return len(created)
+
+
 class UserAnalytics(models.Model):
     """
     User analytics and insights.
+    
+    Rows are kept up to date incrementally by ``analytics.signals`` as logs and
+    grids are written; ``update_analytics`` rebuilds a row from scratch.
     """
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='analytics')
     total_activities_logged = models.IntegerField(default=0)
     total_days_tracked = models.IntegerField(default=0)
     longest_streak = models.IntegerField(default=0)
+    # Length of the run of active days ending at last_activity_date
     current_streak = models.IntegerField(default=0)
     average_completion_rate = models.FloatField(default=0.0)
     last_activity_date = models.DateField(null=True, blank=True)
@@ -30,97 +126,132 @@ class UserAnalytics(models.Model):
     def __str__(self):
         return f"{self.user.username} Analytics"
     
+    @property
+    def active_streak(self):
+        """Return the current streak, or zero if nothing was logged today."""
+        from datetime import date
+        
+        if self.last_activity_date == date.today():
+            return self.current_streak
+        return 0
+    
     def update_analytics(self):
         """Update analytics based on current user data."""
-        from activities.models import ActivityLog, DailyGrid
-        from datetime import date, timedelta
+        from activities.models import DailyGrid
         
         # Update total activities logged
-        self.total_activities_logged = ActivityLog.objects.filter(user=self.user).count()
+        self.total_activities_logged = DailyActivityRollup.objects.filter(
+            user_id=self.user_id
+        ).aggregate(total=Sum('log_count'))['total'] or 0
         
         # Update total days tracked
         self.total_days_tracked = DailyGrid.objects.filter(user=self.user).count()
         
-        # Update last activity date
-        last_log = ActivityLog.objects.filter(user=self.user).order_by('-date').first()
-        if last_log:
-            self.last_activity_date = last_log.date
-        
-        # Calculate streaks
-        self.current_streak = self._calculate_current_streak()
-        self.longest_streak = self._calculate_longest_streak()
+        # Update last activity date and streaks with a single scan of activity dates
+        self._refresh_streaks()
         
         # Calculate average completion rate
         self.average_completion_rate = self._calculate_average_completion_rate()
         
         self.save()
     
-    def _calculate_current_streak(self):
-        """Calculate current streak of consecutive days with activity."""
-        from activities.models import ActivityLog
-        from datetime import date, timedelta
+    def record_log_created(self, log, new_day):
+        """Apply a newly created log to the counters and streaks."""
+        self.record_logs_created(1, {log.date} if new_day else set())
+    
+    def record_logs_created(self, count, new_days):
+        """Apply several created logs to the counters, extending or rescanning streaks once."""
+        self.total_activities_logged += count
         
-        current_date = date.today()
-        streak = 0
+        if not new_days:
+            return
         
-        while True:
-            if ActivityLog.objects.filter(user=self.user, date=current_date).exists():
-                streak += 1
-                current_date -= timedelta(days=1)
-            else:
-                break
+        if self.last_activity_date is None or min(new_days) > self.last_activity_date:
+            for day in sorted(new_days):
+                self._extend_streak(day)
+        else:
+            # A back-filled day can join two runs, so rescan
+            self._refresh_streaks()
+    
+    def record_log_deleted(self, log, day_emptied):
+        """Apply a deleted log to the counters and streaks."""
+        self.record_logs_deleted(1, day_emptied)
+    
+    def record_logs_deleted(self, count, days_emptied):
+        """Apply several deleted logs to the counters, rescanning streaks once if a day emptied."""
+        self.total_activities_logged = max(0, self.total_activities_logged - count)
         
-        return streak
+        if days_emptied:
+            self._refresh_streaks()
     
-    def _calculate_longest_streak(self):
-        """Calculate longest streak of consecutive days with activity."""
-        from activities.models import ActivityLog
-        from datetime import date, timedelta
+    def record_grid_saved(self, grid, created):
+        """Apply a saved grid to the tracked days and completion rate."""
+        self.record_grids_written(1 if created else 0)
+    
+    def record_grids_written(self, created_count):
+        """Apply bulk-written grids to the tracked days and completion rate."""
+        self.total_days_tracked += created_count
+        self.average_completion_rate = self._calculate_average_completion_rate()
+    
+    def record_grid_deleted(self, grid):
+        """Apply a deleted grid to the tracked days and completion rate."""
+        self.total_days_tracked = max(0, self.total_days_tracked - 1)
+        self.average_completion_rate = self._calculate_average_completion_rate()
+    
+    def _extend_streak(self, day):
+        """Append an active day after the last one to the current streak."""
+        from datetime import timedelta
         
-        # Get all dates with activity
-        activity_dates = set(
-            ActivityLog.objects.filter(user=self.user)
-            .values_list('date', flat=True)
+        if self.last_activity_date and day - self.last_activity_date == timedelta(days=1):
+            self.current_streak += 1
+        else:
+            self.current_streak = 1
+        self.longest_streak = max(self.longest_streak, self.current_streak)
+        self.last_activity_date = day
+    
+    def _refresh_streaks(self):
+        """Recalculate last activity date and streaks from activity dates."""
+        from activities.streaks import calculate_streaks
+        
+        dates = list(
+            DailyActivityRollup.objects.filter(user_id=self.user_id)
             .order_by('date')
+            .values_list('date', flat=True)
+            .distinct()
         )
+        self.last_activity_date = dates[-1] if dates else None
+        self.current_streak, self.longest_streak = calculate_streaks(
+            dates, today=self.last_activity_date
+        )
+    
+    def _calculate_current_streak(self):
+        """Calculate current streak of consecutive days with activity."""
+        from activities.streaks import get_user_streaks
         
-        if not activity_dates:
-            return 0
-        
-        longest_streak = 0
-        current_streak = 0
-        previous_date = None
-        
-        for activity_date in sorted(activity_dates):
-            if previous_date is None:
-                current_streak = 1
-            elif (activity_date - previous_date).days == 1:
-                current_streak += 1
-            else:
-                longest_streak = max(longest_streak, current_streak)
-                current_streak = 1
-            
-            previous_date = activity_date
-        
-        longest_streak = max(longest_streak, current_streak)
-        return longest_streak
+        return get_user_streaks(self.user)[0]
+    
+    def _calculate_longest_streak(self):
+        """Calculate longest streak of consecutive days with activity."""
+        from activities.streaks import get_user_streaks
+        
+        return get_user_streaks(self.user)[1]
     
     def _calculate_average_completion_rate(self):
-        """Calculate average completion rate over the last 30 days."""
+        """Calculate average completion rate over the last 30 days in one aggregate."""
         from activities.models import DailyGrid
         from datetime import date, timedelta
         
         thirty_days_ago = date.today() - timedelta(days=30)
-        grids = DailyGrid.objects.filter(
-            user=self.user,
-            date__gte=thirty_days_ago
+        completion = Least(
+            Value(100.0),
+            F('filled_count') * Value(100.0) / F('grid_size'),
+            output_field=models.FloatField()
         )
-        
-        if not grids:
-            return 0.0
-        
-        total_completion = sum(grid.completion_percentage for grid in grids)
-        return total_completion / len(grids)
+        average = DailyGrid.objects.filter(
+            user_id=self.user_id,
+            date__gte=thirty_days_ago
+        ).aggregate(average=Avg(completion))['average']
+        return float(average or 0.0)
 
 
 class ActivityPattern(models.Model):
@@ -178,26 +309,38 @@ class WeeklyReport(models.Model):
     
     @classmethod
     def generate_weekly_report(cls, user, week_start):
-        """Generate a weekly report for a user."""
+        """
+        Generate a weekly report for a user.
+        
+        Every metric is derived from one grouped rollup query and one grid
+        query, and the report is written with one upsert: three queries in
+        all, which ``analytics.tests`` pins. The returned report's primary
+        key is not set when an existing report was updated.
+        """
         from datetime import timedelta
-        from activities.models import ActivityLog, DailyGrid
+        from activities.models import DailyGrid
         
         week_end = week_start + timedelta(days=6)
         
-        # Get activities for the week
-        week_logs = ActivityLog.objects.filter(
-            user=user,
-            date__range=[week_start, week_end]
+        # Get per-day, per-activity totals for the week
+        week_rows = list(
+            DailyActivityRollup.objects.filter(
+                user=user,
+                date__range=[week_start, week_end]
+            )
+            .order_by()
+            .values('date', 'activity_id', 'activity__name')
+            .annotate(count=Sum('log_count'))
         )
         
         # Get grids for the week
-        week_grids = DailyGrid.objects.filter(
+        week_grids = list(DailyGrid.objects.filter(
             user=user,
             date__range=[week_start, week_end]
-        )
+        ))
         
         # Calculate metrics
-        total_activities = week_logs.count()
+        total_activities = sum(row['count'] for row in week_rows)
         
         # Calculate completion rate
         if week_grids:
@@ -207,9 +350,9 @@ class WeeklyReport(models.Model):
         
         # Get top activities
         activity_counts = {}
-        for log in week_logs:
-            activity_name = log.activity.name
-            activity_counts[activity_name] = activity_counts.get(activity_name, 0) + 1
+        for row in week_rows:
+            activity_name = row['activity__name']
+            activity_counts[activity_name] = activity_counts.get(activity_name, 0) + row['count']
         
         top_activities = sorted(
             activity_counts.items(),
@@ -218,30 +361,38 @@ class WeeklyReport(models.Model):
         )[:5]
         
         # Generate insights
-        insights = cls._generate_insights(user, week_start, week_end, week_logs)
+        insights = cls._generate_insights(week_rows)
         
         # Check if streak was maintained
-        streak_maintained = cls._check_streak_maintained(user, week_start, week_end)
+        active_dates = {row['date'] for row in week_rows}
+        streak_maintained = cls._check_streak_maintained(active_dates, week_start, week_end)
         
-        # Create or update report
-        report, created = cls.objects.update_or_create(
+        # Create or update the report with a single upsert statement
+        report = cls(
             user=user,
             week_start=week_start,
-            defaults={
-                'week_end': week_end,
-                'total_activities': total_activities,
-                'completion_rate': completion_rate,
-                'streak_maintained': streak_maintained,
-                'top_activities': top_activities,
-                'insights': insights,
-            }
+            week_end=week_end,
+            total_activities=total_activities,
+            completion_rate=completion_rate,
+            streak_maintained=streak_maintained,
+            top_activities=top_activities,
+            insights=insights,
+        )
+        cls.objects.bulk_create(
+            [report],
+            update_conflicts=True,
+            unique_fields=['user', 'week_start'],
+            update_fields=[
+                'week_end', 'total_activities', 'completion_rate',
+                'streak_maintained', 'top_activities', 'insights',
+            ],
         )
         
         return report
     
     @classmethod
-    def _generate_insights(cls, user, week_start, week_end, week_logs):
-        """Generate insights for the weekly report."""
+    def _generate_insights(cls, week_rows):
+        """Generate insights from the week's per-day, per-activity totals."""
         insights = {
             'best_day': None,
             'most_productive_time': None,
@@ -249,40 +400,31 @@ class WeeklyReport(models.Model):
             'consistency_score': 0.0,
         }
         
-        if not week_logs:
+        if not week_rows:
             return insights
         
         # Find best day (most activities)
         day_counts = {}
-        for log in week_logs:
-            day = log.date.strftime('%A')
-            day_counts[day] = day_counts.get(day, 0) + 1
+        for row in week_rows:
+            day = row['date'].strftime('%A')
+            day_counts[day] = day_counts.get(day, 0) + row['count']
         
         if day_counts:
             insights['best_day'] = max(day_counts.items(), key=lambda x: x[1])[0]
         
         # Calculate activity diversity
-        unique_activities = len(set(log.activity_id for log in week_logs))
+        unique_activities = len({row['activity_id'] for row in week_rows})
         insights['activity_diversity'] = unique_activities
         
         # Calculate consistency score
         total_possible_days = 7
-        days_with_activity = len(set(log.date for log in week_logs))
+        days_with_activity = len({row['date'] for row in week_rows})
         insights['consistency_score'] = (days_with_activity / total_possible_days) * 100
         
         return insights
     
     @classmethod
-    def _check_streak_maintained(cls, user, week_start, week_end):
-        """Check if user maintained their streak during the week."""
-        from activities.models import ActivityLog
-        from datetime import timedelta
-        
-        # Check if there was activity on every day of the week
-        current_date = week_start
-        while current_date <= week_end:
-            if not ActivityLog.objects.filter(user=user, date=current_date).exists():
-                return False
-            current_date += timedelta(days=1)
-        
-        return True 
\ No newline at end of file
+    def _check_streak_maintained(cls, active_dates, week_start, week_end):
+        """Check if user logged activity on every day of the week."""
+        days_in_week = (week_end - week_start).days + 1
+        return len(active_dates) == days_in_week
@@ -0,0 +1,208 @@
+"""
+Pattern mining over a user's activity logs.
+
+Logs are loaded once into NumPy arrays and every activity's histograms and
+trends are computed together, then written to ``ActivityPattern`` in place of
+the user's previously mined patterns.
+"""
+
+from datetime import date
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+from django.db import transaction
+from django.db.models.functions import ExtractHour
+
+from .models import ActivityPattern
+
+# Pattern types written by this module; other types are left alone
+MINED_TYPES = ['day_of_week', 'time_of_day', 'trend']
+
+DAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# Activities with fewer logs than this get no patterns
+MIN_SAMPLES = 5
+
+# Number of logs at which a histogram pattern reaches full confidence
+CONFIDENT_SAMPLES = 30
+
+# Number of recent weeks used for trend analysis
+TREND_WEEKS = 12
+
+# Weekly slope (logs per week) below which a trend is reported as stable
+STABLE_SLOPE = 0.1
+
+# 1970-01-01 was a Thursday
+EPOCH_WEEKDAY = 3
+
+
+def load_log_arrays(user):
+    """Return ``(activity_ids, days, hours)`` arrays for all of a user's logs."""
+    from activities.models import ActivityLog
+
+    try:
+        user_tz = ZoneInfo(user.timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        user_tz = ZoneInfo('UTC')
+
+    rows = list(
+        ActivityLog.objects.filter(user=user)
+        .order_by()
+        .annotate(hour=ExtractHour('logged_at', tzinfo=user_tz))
+        .values_list('activity_id', 'date', 'hour')
+    )
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+
+    activity_ids, dates, hours = zip(*rows)
+    days = np.array(dates, dtype='datetime64[D]').astype(np.int64)
+    return (
+        np.array(activity_ids, dtype=np.int64),
+        days,
+        np.array(hours, dtype=np.int64),
+    )
+
+
+def _concentration(histograms):
+    """Return 1 - normalised entropy for each row of a histogram matrix."""
+    totals = histograms.sum(axis=1, keepdims=True)
+    probabilities = np.divide(
+        histograms, totals,
+        out=np.zeros(histograms.shape, dtype=float),
+        where=totals > 0
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        entropy = -np.where(probabilities > 0, probabilities * np.log(probabilities), 0.0).sum(axis=1)
+    return 1.0 - entropy / np.log(histograms.shape[1])
+
+
+def _trend_slopes(weekly_counts):
+    """Return least-squares slopes and r-squared values for each row."""
+    weeks = np.arange(weekly_counts.shape[1], dtype=float)
+    centred_weeks = weeks - weeks.mean()
+    centred_counts = weekly_counts - weekly_counts.mean(axis=1, keepdims=True)
+
+    slopes = centred_counts @ centred_weeks / (centred_weeks @ centred_weeks)
+    total_variance = (centred_counts ** 2).sum(axis=1)
+    explained_variance = slopes ** 2 * (centred_weeks @ centred_weeks)
+    r_squared = np.divide(
+        explained_variance, total_variance,
+        out=np.zeros_like(slopes),
+        where=total_variance > 0
+    )
+    return slopes, r_squared
+
+
+def mine_patterns(user, today=None):
+    """Compute and store day-of-week, time-of-day and trend patterns for a user."""
+    today = today or date.today()
+    activity_ids, days, hours = load_log_arrays(user)
+    if not len(activity_ids):
+        return _store_patterns(user, [])
+
+    activities, index = np.unique(activity_ids, return_inverse=True)
+    activity_count = len(activities)
+    samples = np.bincount(index, minlength=activity_count)
+
+    weekdays = (days + EPOCH_WEEKDAY) % 7
+    weekday_counts = np.bincount(
+        index * 7 + weekdays, minlength=activity_count * 7
+    ).reshape(activity_count, 7)
+    hour_counts = np.bincount(
+        index * 24 + hours, minlength=activity_count * 24
+    ).reshape(activity_count, 24)
+
+    weeks_ago = (np.datetime64(today, 'D').astype(np.int64) - days) // 7
+    recent = (weeks_ago >= 0) & (weeks_ago < TREND_WEEKS)
+    weekly_counts = np.bincount(
+        index[recent] * TREND_WEEKS + (TREND_WEEKS - 1 - weeks_ago[recent]),
+        minlength=activity_count * TREND_WEEKS
+    ).reshape(activity_count, TREND_WEEKS).astype(float)
+
+    sample_weight = np.minimum(1.0, samples / CONFIDENT_SAMPLES)
+    weekday_confidence = _concentration(weekday_counts) * sample_weight
+    hour_confidence = _concentration(hour_counts) * sample_weight
+    slopes, r_squared = _trend_slopes(weekly_counts)
+    trend_confidence = r_squared * ((weekly_counts > 0).sum(axis=1) / TREND_WEEKS)
+
+    patterns = []
+    for i in np.flatnonzero(samples >= MIN_SAMPLES):
+        activity_id = int(activities[i])
+        slope = float(slopes[i])
+        if slope > STABLE_SLOPE:
+            direction = 'increasing'
+        elif slope < -STABLE_SLOPE:
+            direction = 'decreasing'
+        else:
+            direction = 'stable'
+
+        patterns.extend([
+            ActivityPattern(
+                user=user,
+                activity_id=activity_id,
+                pattern_type='day_of_week',
+                pattern_data={
+                    'counts': weekday_counts[i].tolist(),
+                    'peak_day': DAY_NAMES[int(weekday_counts[i].argmax())],
+                    'samples': int(samples[i]),
+                },
+                confidence_score=float(weekday_confidence[i]),
+            ),
+            ActivityPattern(
+                user=user,
+                activity_id=activity_id,
+                pattern_type='time_of_day',
+                pattern_data={
+                    'counts': hour_counts[i].tolist(),
+                    'peak_hour': int(hour_counts[i].argmax()),
+                    'samples': int(samples[i]),
+                },
+                confidence_score=float(hour_confidence[i]),
+            ),
+            ActivityPattern(
+                user=user,
+                activity_id=activity_id,
+                pattern_type='trend',
+                pattern_data={
+                    'weekly_counts': weekly_counts[i].astype(int).tolist(),
+                    'slope': round(slope, 4),
+                    'direction': direction,
+                },
+                confidence_score=float(trend_confidence[i]),
+            ),
+        ])
+
+    return _store_patterns(user, patterns)
+
+
+def _store_patterns(user, patterns):
+    """Upsert a user's mined patterns and delete those of activities that no longer qualify."""
+    with transaction.atomic():
+        ActivityPattern.objects.filter(user=user, pattern_type__in=MINED_TYPES).exclude(
+            activity_id__in={pattern.activity_id for pattern in patterns}
+        ).delete()
+        if not patterns:
+            return []
+        return ActivityPattern.objects.bulk_create(
+            patterns,
+            update_conflicts=True,
+            unique_fields=['user', 'activity', 'pattern_type'],
+            update_fields=['pattern_data', 'confidence_score', 'updated_at'],
+        )
+
+
+def describe_pattern(pattern):
+    """Return a short human-readable description of a pattern."""
+    data = pattern.pattern_data
+    name = pattern.activity.name
+    if pattern.pattern_type == 'day_of_week':
+        return f"You log {name} most often on {data.get('peak_day')}."
+    if pattern.pattern_type == 'time_of_day':
+        return f"You usually log {name} around {data.get('peak_hour', 0):02d}:00."
+    if pattern.pattern_type == 'trend':
+        direction = data.get('direction', 'stable')
+        if direction == 'stable':
+            return f"Your {name} habit has been steady over the last {TREND_WEEKS} weeks."
+        return f"Your {name} habit has been {direction} over the last {TREND_WEEKS} weeks."
+    return f"{pattern.get_pattern_type_display()} pattern for {name}."
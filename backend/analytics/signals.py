@@ -0,0 +1,133 @@
+"""
+Signal handlers that keep analytics in step with activity writes.
+"""
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from activities.models import ActivityLog, DailyGrid
+from activities.signals import (
+    activity_logs_bulk_created, activity_logs_bulk_deleted, history_imported, is_bulk_delete
+)
+from . import heatmap
+from .models import DailyActivityRollup, UserAnalytics
+
+
+def _locked_analytics(user_id, create=True):
+    """Return the user's analytics row locked for update, or None."""
+    queryset = UserAnalytics.objects.select_for_update()
+    if create:
+        analytics, _ = queryset.get_or_create(user_id=user_id)
+        return analytics
+    return queryset.filter(user_id=user_id).first()
+
+
+@receiver(post_save, sender=ActivityLog)
+def track_log_created(sender, instance, created, raw=False, **kwargs):
+    """Roll up the log, bump counters and extend streaks when a log is created."""
+    if not created or raw:
+        return
+    
+    with transaction.atomic():
+        analytics = _locked_analytics(instance.user_id)
+        new_day = not DailyActivityRollup.objects.filter(
+            user_id=instance.user_id,
+            date=instance.date
+        ).exists()
+        DailyActivityRollup.record_log(instance)
+        analytics.record_log_created(instance, new_day)
+        analytics.save()
+
+
+@receiver(post_delete, sender=ActivityLog)
+def track_log_deleted(sender, instance, origin=None, **kwargs):
+    """Update the rollup, decrement counters and reset streaks when a log is deleted."""
+    if is_bulk_delete(instance, origin):
+        # Handled once per user by track_bulk_logs_deleted
+        return
+    
+    with transaction.atomic():
+        DailyActivityRollup.rebuild(user_id=instance.user_id, dates=[instance.date])
+        analytics = _locked_analytics(instance.user_id, create=False)
+        if analytics is None:
+            return
+        day_emptied = not DailyActivityRollup.objects.filter(
+            user_id=instance.user_id,
+            date=instance.date
+        ).exists()
+        analytics.record_log_deleted(instance, day_emptied)
+        analytics.save()
+
+
+@receiver(activity_logs_bulk_deleted)
+def track_bulk_logs_deleted(sender, user_id, log_ids, dates, **kwargs):
+    """Rebuild the affected rollup days and rescan streaks once after a bulk delete."""
+    with transaction.atomic():
+        DailyActivityRollup.rebuild(user_id=user_id, dates=dates)
+        analytics = _locked_analytics(user_id, create=False)
+        if analytics is None:
+            return
+        active_dates = set(
+            DailyActivityRollup.objects.filter(user_id=user_id, date__in=dates)
+            .values_list('date', flat=True)
+        )
+        analytics.record_logs_deleted(len(log_ids), days_emptied=bool(dates - active_dates))
+        analytics.save()
+
+
+@receiver(post_save, sender=DailyGrid)
+def track_grid_saved(sender, instance, created, raw=False, **kwargs):
+    """Update tracked days, completion rate and heatmap when a grid is saved."""
+    if raw:
+        return
+    
+    with transaction.atomic():
+        analytics = _locked_analytics(instance.user_id)
+        analytics.record_grid_saved(instance, created)
+        analytics.save()
+    
+    heatmap.invalidate_year(instance.user_id, instance.date.year)
+
+
+@receiver(post_delete, sender=DailyGrid)
+def track_grid_deleted(sender, instance, **kwargs):
+    """Update tracked days, completion rate and heatmap when a grid is deleted."""
+    heatmap.invalidate_year(instance.user_id, instance.date.year)
+    
+    with transaction.atomic():
+        analytics = _locked_analytics(instance.user_id, create=False)
+        if analytics is None:
+            return
+        analytics.record_grid_deleted(instance)
+        analytics.save()
+
+
+@receiver(activity_logs_bulk_created)
+def track_bulk_logs_created(sender, user_id, logs, grids, created_grids=0, **kwargs):
+    """Roll up bulk-created logs and apply them to counters and streaks in one pass."""
+    dates = {log.date for log in logs}
+    
+    with transaction.atomic():
+        analytics = _locked_analytics(user_id)
+        active_dates = set(
+            DailyActivityRollup.objects.filter(user_id=user_id, date__in=dates)
+            .values_list('date', flat=True)
+        )
+        DailyActivityRollup.rebuild(user_id=user_id, dates=dates)
+        analytics.record_logs_created(len(logs), new_days=dates - active_dates)
+        analytics.record_grids_written(created_grids)
+        analytics.save()
+    
+    heatmap.invalidate_years(user_id, {grid.date.year for grid in grids})
+
+
+@receiver(history_imported)
+def rebuild_imported_analytics(sender, user_id, **kwargs):
+    """Rebuild rollups, analytics and cached heatmaps after a history import."""
+    with transaction.atomic():
+        DailyActivityRollup.rebuild(user_id=user_id)
+        analytics = _locked_analytics(user_id)
+        analytics.update_analytics()
+    
+    heatmap.drop_user(user_id)
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""
+Celery tasks for analytics.
+"""
+
+import logging
+import uuid
+from datetime import timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from celery import shared_task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from core import locks
+from .models import WeeklyReport
+from .patterns import mine_patterns
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+DB_SLOT_KEY = 'weekly-reports:db-slot:{}'
+
+
+def last_complete_week_start(user, now=None):
+    """Return the Monday of the user's most recent complete week in their timezone."""
+    try:
+        user_tz = ZoneInfo(user.timezone)
+    except (ZoneInfoNotFoundError, ValueError):
+        user_tz = ZoneInfo('UTC')
+    
+    local_today = (now or timezone.now()).astimezone(user_tz).date()
+    return local_today - timedelta(days=local_today.weekday() + 7)
+
+
+def _acquire_db_slot(token):
+    """Claim one of the shared database slots for ``token``, returning its key or None."""
+    for slot in range(settings.WEEKLY_REPORT_MAX_CONCURRENCY):
+        key = DB_SLOT_KEY.format(slot)
+        if locks.acquire(key, token, settings.WEEKLY_REPORT_SLOT_TIMEOUT):
+            return key
+    return None
+
+
+def _queue_user_chunks(task, chunk_size):
+    """Queue ``task(first_user_id, last_user_id)`` for each chunk of active users."""
+    user_ids = (
+        User.objects.filter(is_active=True)
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+    
+    chunks = 0
+    chunk = []
+    for user_id in user_ids.iterator(chunk_size=chunk_size):
+        chunk.append(user_id)
+        if len(chunk) == chunk_size:
+            task.delay(chunk[0], chunk[-1])
+            chunks += 1
+            chunk = []
+    if chunk:
+        task.delay(chunk[0], chunk[-1])
+        chunks += 1
+    return chunks
+
+
+@shared_task
+def schedule_weekly_reports():
+    """Split active users into id ranges and queue one report chunk per range."""
+    chunks = _queue_user_chunks(generate_weekly_reports_chunk, settings.WEEKLY_REPORT_CHUNK_SIZE)
+    logger.info('Queued %s weekly report chunks', chunks)
+    return chunks
+
+
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True, max_retries=None)
+def generate_weekly_reports_chunk(self, first_user_id, last_user_id):
+    """
+    Generate last week's report for every active user in an id range.
+    
+    Users who already have a report for their week are skipped, so a chunk
+    redelivered after a worker crash only does the remaining work.
+    """
+    token = uuid.uuid4().hex
+    slot = _acquire_db_slot(token)
+    if slot is None:
+        raise self.retry(countdown=settings.WEEKLY_REPORT_RETRY_DELAY)
+    
+    try:
+        users = list(
+            User.objects.filter(is_active=True, id__range=(first_user_id, last_user_id))
+            .order_by('id')
+            .only('id', 'timezone')
+        )
+        week_starts = {user.id: last_complete_week_start(user) for user in users}
+        existing = set(
+            WeeklyReport.objects.filter(
+                user_id__in=week_starts,
+                week_start__in=set(week_starts.values())
+            ).values_list('user_id', 'week_start')
+        )
+        
+        progress = {'total': len(users), 'generated': 0, 'skipped': 0}
+        self.update_state(state='PROGRESS', meta=progress)
+        for user in users:
+            week_start = week_starts[user.id]
+            if (user.id, week_start) in existing:
+                progress['skipped'] += 1
+            else:
+                WeeklyReport.generate_weekly_report(user, week_start)
+                progress['generated'] += 1
+        
+        logger.info(
+            'Weekly reports for users %s-%s: %s generated, %s skipped',
+            first_user_id, last_user_id, progress['generated'], progress['skipped']
+        )
+        return progress
+    finally:
+        # The slot may have expired and been claimed by another chunk
+        locks.release(slot, token)
+
+
+@shared_task
+def schedule_pattern_mining():
+    """Split active users into id ranges and queue one pattern-mining chunk per range."""
+    chunks = _queue_user_chunks(mine_patterns_chunk, settings.PATTERN_MINING_CHUNK_SIZE)
+    logger.info('Queued %s pattern mining chunks', chunks)
+    return chunks
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def mine_patterns_chunk(first_user_id, last_user_id):
+    """Recompute activity patterns for every active user in an id range."""
+    users = (
+        User.objects.filter(is_active=True, id__range=(first_user_id, last_user_id))
+        .order_by('id')
+        .only('id', 'timezone')
+    )
+    
+    pattern_count = 0
+    for user in users.iterator():
+        pattern_count += len(mine_patterns(user))
+    return pattern_count
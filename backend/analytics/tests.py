@@ -0,0 +1,214 @@
+"""
+Tests for the analytics app.
+"""
+
+import random
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db.models import Count
+from django.db.models.functions import ExtractIsoWeekDay
+from django.test import TestCase
+
+from activities.models import Activity, ActivityLog, DailyGrid
+from . import patterns
+from .models import ActivityPattern, WeeklyReport
+
+User = get_user_model()
+
+SEEDS = range(6)
+
+
+class PatternEnginePropertyTests(TestCase):
+    """
+    The vectorised pattern engine must agree with per-activity ORM
+    aggregates over random log histories.
+    """
+
+    def setUp(self):
+        self.today = date.today()
+
+    def write_history(self, rng, user, activities):
+        """Bulk-write random logs with random dates and local times."""
+        user_tz = ZoneInfo(user.timezone)
+        keys = {
+            (rng.choice(activities), self.today - timedelta(days=rng.randrange(-2, 200)), rng.randrange(16))
+            for _ in range(rng.randrange(40, 400))
+        }
+        logs = ActivityLog.objects.bulk_create(
+            ActivityLog(user=user, activity=activity, date=log_date, grid_position=position)
+            for activity, log_date, position in keys
+        )
+        for log in logs:
+            local = datetime.combine(log.date, time(rng.randrange(24), rng.randrange(60)), user_tz)
+            log.logged_at = local.astimezone(dt_timezone.utc)
+        # auto_now_add overrides logged_at on insert, but not on bulk_update
+        ActivityLog.objects.bulk_update(logs, ['logged_at'])
+
+    def orm_weekday_counts(self, activity):
+        counts = [0] * 7
+        rows = (
+            ActivityLog.objects.filter(activity=activity)
+            .annotate(weekday=ExtractIsoWeekDay('date'))
+            .values('weekday')
+            .annotate(count=Count('id'))
+        )
+        for row in rows:
+            counts[row['weekday'] - 1] = row['count']
+        return counts
+
+    def orm_hour_counts(self, activity, user_tz):
+        counts = [0] * 24
+        for logged_at in ActivityLog.objects.filter(activity=activity).values_list('logged_at', flat=True):
+            counts[logged_at.astimezone(user_tz).hour] += 1
+        return counts
+
+    def orm_weekly_counts(self, activity):
+        counts = []
+        for weeks_ago in range(patterns.TREND_WEEKS - 1, -1, -1):
+            end = self.today - timedelta(days=7 * weeks_ago)
+            counts.append(
+                ActivityLog.objects.filter(
+                    activity=activity,
+                    date__range=(end - timedelta(days=6), end)
+                ).count()
+            )
+        return counts
+
+    def test_patterns_match_orm_for_random_histories(self):
+        for seed in SEEDS:
+            with self.subTest(seed=seed):
+                rng = random.Random(seed)
+                user = User.objects.create_user(
+                    f'patterns-{seed}',
+                    password='unused',
+                    timezone=rng.choice(['UTC', 'Asia/Kolkata', 'America/New_York'])
+                )
+                activities = [
+                    Activity.objects.create(user=user, name=f'Activity {i}')
+                    for i in range(rng.randrange(1, 6))
+                ]
+                self.write_history(rng, user, activities)
+                patterns.mine_patterns(user, today=self.today)
+
+                mined = {
+                    (pattern.activity_id, pattern.pattern_type): pattern
+                    for pattern in ActivityPattern.objects.filter(user=user)
+                }
+                samples = dict(
+                    ActivityLog.objects.filter(user=user)
+                    .values_list('activity')
+                    .annotate(count=Count('id'))
+                )
+                for activity in activities:
+                    if samples.get(activity.id, 0) < patterns.MIN_SAMPLES:
+                        self.assertNotIn((activity.id, 'trend'), mined)
+                        continue
+                    self.assert_activity_patterns(activity, samples[activity.id], mined, ZoneInfo(user.timezone))
+
+    def assert_activity_patterns(self, activity, sample_count, mined, user_tz):
+        day_of_week = mined[activity.id, 'day_of_week']
+        weekday_counts = self.orm_weekday_counts(activity)
+        self.assertEqual(day_of_week.pattern_data['counts'], weekday_counts)
+        self.assertEqual(day_of_week.pattern_data['samples'], sample_count)
+        self.assertEqual(
+            day_of_week.pattern_data['peak_day'],
+            patterns.DAY_NAMES[weekday_counts.index(max(weekday_counts))]
+        )
+
+        time_of_day = mined[activity.id, 'time_of_day']
+        hour_counts = self.orm_hour_counts(activity, user_tz)
+        self.assertEqual(time_of_day.pattern_data['counts'], hour_counts)
+        self.assertEqual(time_of_day.pattern_data['peak_hour'], hour_counts.index(max(hour_counts)))
+
+        trend = mined[activity.id, 'trend']
+        weekly_counts = self.orm_weekly_counts(activity)
+        self.assertEqual(trend.pattern_data['weekly_counts'], weekly_counts)
+        slope = np.polyfit(np.arange(patterns.TREND_WEEKS), weekly_counts, 1)[0]
+        self.assertAlmostEqual(trend.pattern_data['slope'], round(slope, 4), places=4)
+
+        for pattern in (day_of_week, time_of_day, trend):
+            self.assertGreaterEqual(pattern.confidence_score, 0.0)
+            self.assertLessEqual(pattern.confidence_score, 1.0 + 1e-9)
+
+    def test_no_logs_mines_nothing(self):
+        user = User.objects.create_user('patterns-empty', password='unused')
+        Activity.objects.create(user=user, name='Unused')
+        self.assertEqual(patterns.mine_patterns(user, today=self.today), [])
+        self.assertFalse(ActivityPattern.objects.filter(user=user).exists())
+
+    def test_remining_drops_patterns_that_no_longer_apply(self):
+        user = User.objects.create_user('patterns-stale', password='unused')
+        kept, dropped = [Activity.objects.create(user=user, name=name) for name in ('Kept', 'Dropped')]
+        for activity in (kept, dropped):
+            ActivityLog.objects.bulk_create(
+                ActivityLog(user=user, activity=activity, date=self.today - timedelta(days=day), grid_position=0)
+                for day in range(patterns.MIN_SAMPLES)
+            )
+        correlation = ActivityPattern.objects.create(user=user, activity=dropped, pattern_type='correlation')
+        patterns.mine_patterns(user, today=self.today)
+
+        ActivityLog.objects.filter(activity=dropped).delete()
+        patterns.mine_patterns(user, today=self.today)
+        self.assertEqual(
+            set(ActivityPattern.objects.filter(user=user).values_list('activity_id', 'pattern_type')),
+            {(kept.id, pattern_type) for pattern_type in patterns.MINED_TYPES} | {(dropped.id, 'correlation')}
+        )
+
+        ActivityLog.objects.filter(user=user).delete()
+        patterns.mine_patterns(user, today=self.today)
+        self.assertEqual(list(ActivityPattern.objects.filter(user=user)), [correlation])
+
+
+class WeeklyReportQueryTests(TestCase):
+    """
+    A weekly report costs one rollup query, one grid query and the upsert,
+    however busy the week was, well within its budget of four.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create_user('reports', password='unused')
+        today = date.today()
+        self.week_start = today - timedelta(days=today.weekday() + 7)
+
+    def log_week(self, activity_count):
+        """Log ``activity_count`` new activities on every day of the week."""
+        first = Activity.objects.filter(user=self.user).count()
+        activities = [
+            Activity.objects.create(user=self.user, name=f'Activity {index}')
+            for index in range(first, first + activity_count)
+        ]
+        DailyGrid.log_activities(self.user, [
+            {'date': self.week_start + timedelta(days=day), 'activity_id': activity.id, 'position': first + index}
+            for day in range(7)
+            for index, activity in enumerate(activities)
+        ])
+
+    def assert_report_queries(self):
+        for attempt in ('created', 'updated'):
+            with self.subTest(report=attempt), self.assertNumQueries(3):
+                WeeklyReport.generate_weekly_report(self.user, self.week_start)
+
+    def test_empty_week(self):
+        self.assert_report_queries()
+
+    def test_light_week(self):
+        self.log_week(1)
+        self.assert_report_queries()
+
+    def test_regenerating_updates_the_report(self):
+        self.log_week(1)
+        WeeklyReport.generate_weekly_report(self.user, self.week_start)
+        self.log_week(2)
+        WeeklyReport.generate_weekly_report(self.user, self.week_start)
+        report = WeeklyReport.objects.get(user=self.user, week_start=self.week_start)
+        self.assertEqual(report.total_activities, 21)
+
+    def test_busy_week(self):
+        self.log_week(8)
+        self.assert_report_queries()
+        report = WeeklyReport.objects.get(user=self.user, week_start=self.week_start)
+        self.assertEqual(report.total_activities, 56)
+        self.assertTrue(report.streak_maintained)
\ No newline at end of file
@@ -0,0 +1,14 @@
+"""
+App configuration for api app.
+"""
+
+from django.apps import AppConfig
+
+
+class ApiConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'api'
+    verbose_name = 'API'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,108 @@
+"""
+Per-user cache of serialized API responses.
+
+Entries live under a per-user version number. Any write that changes what a
+user would see bumps that user's version after it commits, which orphans all
+of their entries at once; other users' entries are untouched.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'api-cache:version:{user_id}'
+ENTRY_KEY = 'api-cache:{user_id}:{version}:{name}:{variant}'
+STATS_KEY = 'api-cache:stats:{name}:{outcome}'
+
+CACHED_RESPONSES = ('activities', 'today-grid')
+
+
+def is_enabled():
+    """Return whether responses should be cached."""
+    return settings.API_RESPONSE_CACHE_ENABLED
+
+
+def _new_version():
+    # Start from the clock so a user whose version key was evicted cannot
+    # land back on a version that still has entries
+    return time.time_ns() // 1000
+
+
+def get_version(user_id):
+    """Return the user's current cache version."""
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(user_id):
+    """Invalidate every cached response for a user once the current transaction commits."""
+    def bump():
+        key = VERSION_KEY.format(user_id=user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), timeout=None)
+    
+    transaction.on_commit(bump)
+
+
+def _count(name, outcome):
+    key = STATS_KEY.format(name=name, outcome=outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def get_or_build(user_id, name, variant, build):
+    """Return cached data for a user's response, calling ``build()`` on a miss."""
+    if not is_enabled():
+        return build()
+    
+    key = ENTRY_KEY.format(
+        user_id=user_id,
+        version=get_version(user_id),
+        name=name,
+        variant=variant
+    )
+    data = cache.get(key)
+    if data is not None:
+        _count(name, 'hits')
+        return data
+    
+    _count(name, 'misses')
+    data = build()
+    cache.set(key, data, settings.API_RESPONSE_CACHE_TIMEOUT)
+    return data
+
+
+def get_stats():
+    """Return ``{name: {'hits': n, 'misses': n}}`` for every cached response."""
+    keys = [
+        STATS_KEY.format(name=name, outcome=outcome)
+        for name in CACHED_RESPONSES
+        for outcome in ('hits', 'misses')
+    ]
+    counts = cache.get_many(keys)
+    return {
+        name: {
+            outcome: counts.get(STATS_KEY.format(name=name, outcome=outcome), 0)
+            for outcome in ('hits', 'misses')
+        }
+        for name in CACHED_RESPONSES
+    }
+
+
+def reset_stats():
+    """Zero the hit and miss counters."""
+    cache.delete_many([
+        STATS_KEY.format(name=name, outcome=outcome)
+        for name in CACHED_RESPONSES
+        for outcome in ('hits', 'misses')
+    ])
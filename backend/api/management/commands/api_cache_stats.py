@@ -0,0 +1,29 @@
+"""
+Report hit and miss counts for the per-user API response cache.
+"""
+
+from django.core.management.base import BaseCommand
+
+from api import cache as response_cache
+
+
+class Command(BaseCommand):
+    help = 'Show hit and miss counts for cached API responses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after reporting.')
+
+    def handle(self, *args, **options):
+        if not response_cache.is_enabled():
+            self.stdout.write(self.style.WARNING('API_RESPONSE_CACHE_ENABLED is off.'))
+
+        for name, counts in response_cache.get_stats().items():
+            total = counts['hits'] + counts['misses']
+            ratio = counts['hits'] / total * 100 if total else 0.0
+            self.stdout.write(
+                f"{name}: {counts['hits']} hits, {counts['misses']} misses ({ratio:.1f}% hit rate)"
+            )
+
+        if options['reset']:
+            response_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset.'))
@@ -0,0 +1,115 @@
+"""
+Benchmark API renderers and response compression.
+"""
+
+import gzip
+import time
+import uuid
+from datetime import date, timedelta
+
+import brotli
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from activities.models import Activity, DailyGrid
+from api.renderers import MessagePackRenderer, ORJSONRenderer
+from api.views import ActivityViewSet, AnalyticsViewSet, DailyGridViewSet
+
+User = get_user_model()
+
+RENDERERS = [
+    ('drf-json', JSONRenderer()),
+    ('orjson', ORJSONRenderer()),
+    ('msgpack', MessagePackRenderer()),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Render grid, activity and analytics responses with each renderer and '
+        'report render time and raw, gzip and brotli sizes. Seeds a throwaway '
+        'user inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365, help='Days of grids to seed.')
+        parser.add_argument('--activities', type=int, default=12)
+        parser.add_argument('--repeat', type=int, default=50, help='Renders per measurement.')
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if not 0 < days <= settings.GRID_RANGE_STREAM_DAYS:
+            raise CommandError(f'--days must be between 1 and {settings.GRID_RANGE_STREAM_DAYS}.')
+
+        today = date.today()
+        start = today - timedelta(days=days - 1)
+        endpoints = [
+            ('grids list', DailyGridViewSet, {'get': 'list'}, '/api/grids/?page_size=100', {}),
+            ('grid range', DailyGridViewSet, {'get': 'grid_range'}, '/api/grids/range/',
+             {'start_date': start.isoformat(), 'end_date': today.isoformat()}),
+            ('activities', ActivityViewSet, {'get': 'list'}, '/api/activities/', {}),
+            ('streaks', AnalyticsViewSet, {'get': 'streaks'}, '/api/analytics/streaks/', {}),
+            ('completion', AnalyticsViewSet, {'get': 'completion_rates'}, '/api/analytics/completion_rates/', {}),
+            ('heatmap', AnalyticsViewSet, {'get': 'heatmap'}, '/api/analytics/heatmap/', {}),
+        ]
+
+        overrides = {
+            'API_RESPONSE_CACHE_ENABLED': False,
+            'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver'],
+        }
+        with override_settings(**overrides), transaction.atomic():
+            user = User.objects.create_user(
+                username=f'bench-{uuid.uuid4().hex[:12]}',
+                default_grid_size=64
+            )
+            self._seed(user, start, days, options['activities'])
+
+            self.stdout.write(
+                f"{'endpoint':<12} {'renderer':<9} {'render ms':>9} {'raw B':>9} {'gzip B':>9} {'br B':>9}"
+            )
+            for label, viewset, actions, path, kwargs in endpoints:
+                data = self._response_data(user, viewset, actions, path, kwargs)
+                for name, renderer in RENDERERS:
+                    elapsed, body = self._time_render(renderer, data, options['repeat'])
+                    self.stdout.write(
+                        f'{label:<12} {name:<9} {elapsed:>9.3f} {len(body):>9} '
+                        f'{len(gzip.compress(body)):>9} '
+                        f'{len(brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY)):>9}'
+                    )
+            transaction.set_rollback(True)
+
+    def _seed(self, user, start, days, activity_count):
+        activities = [
+            Activity.objects.create(user=user, name=f'Benchmark {index}')
+            for index in range(activity_count)
+        ]
+        taps = [
+            {
+                'date': start + timedelta(days=day),
+                'activity_id': activities[(day + slot) % activity_count].id,
+                'position': slot,
+            }
+            for day in range(days)
+            for slot in range(day % 9)
+        ]
+        for offset in range(0, len(taps), 500):
+            DailyGrid.log_activities(user, taps[offset:offset + 500])
+
+    def _response_data(self, user, viewset, actions, path, kwargs):
+        request = APIRequestFactory().get(path)
+        force_authenticate(request, user=user)
+        response = viewset.as_view(actions)(request, **kwargs)
+        if response.status_code != 200:
+            raise CommandError(f'{path} returned {response.status_code}')
+        return response.data
+
+    def _time_render(self, renderer, data, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            body = renderer.render(data, renderer.media_type, {})
+        return (time.perf_counter() - started) * 1000 / repeat, body
@@ -0,0 +1,130 @@
+"""
+Reusable view mixins for the API.
+"""
+
+import hashlib
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class ConditionalMixin:
+    """
+    ETag and Last-Modified support for model viewsets, keyed on ``updated_at``.
+    
+    Reads answer 304 to a matching ``If-None-Match`` or a fresh
+    ``If-Modified-Since`` before anything is serialized. Writes carrying
+    ``If-Match`` or ``If-Unmodified-Since`` lock the row and answer 412 when
+    the client's copy is stale. Views whose responses depend on more than
+    the rows' own ``updated_at`` override ``get_version_parts``.
+    """
+    
+    def get_version_parts(self):
+        """Return ``(parts, last_modified)`` for state outside the rows themselves."""
+        return (), None
+    
+    def _validators(self, parts, last_modified):
+        extra_parts, extra_modified = self.get_version_parts()
+        key = ':'.join(str(part) for part in (*parts, *extra_parts))
+        etag = quote_etag(hashlib.md5(key.encode(), usedforsecurity=False).hexdigest())
+        if extra_modified is not None and (last_modified is None or extra_modified > last_modified):
+            last_modified = extra_modified
+        return etag, last_modified
+    
+    def get_object_validators(self, instance):
+        """Return ``(etag, last_modified)`` for one object."""
+        return self._validators((instance.pk, instance.updated_at.isoformat()), instance.updated_at)
+    
+    def get_list_validators(self, queryset):
+        """Return ``(etag, last_modified)`` for a list, using one aggregate query."""
+        stats = queryset.order_by().aggregate(count=Count('pk'), latest=Max('updated_at'))
+        latest = stats['latest']
+        parts = (self.request.get_full_path(), stats['count'], latest.isoformat() if latest else '')
+        return self._validators(parts, latest)
+    
+    def conditional_response(self, request, etag, last_modified):
+        """Return a 304 or 412 response if the request's preconditions say so."""
+        if_match = request.META.get('HTTP_IF_MATCH')
+        if if_match:
+            # Compression weakens ETags; the representation behind them is the same
+            request.META['HTTP_IF_MATCH'] = if_match.replace('W/', '')
+        return get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=int(last_modified.timestamp()) if last_modified else None
+        )
+    
+    def set_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
+    
+    def check_write_preconditions(self, request, instance):
+        """
+        Lock an object and return a 412 response if the client's copy is stale.
+        
+        Must be called inside a transaction so the lock is held until the
+        write commits.
+        """
+        if 'HTTP_IF_MATCH' not in request.META and 'HTTP_IF_UNMODIFIED_SINCE' not in request.META:
+            return None
+        
+        instance.updated_at = (
+            type(instance).objects.select_for_update()
+            .filter(pk=instance.pk)
+            .values_list('updated_at', flat=True)
+            .get()
+        )
+        etag, last_modified = self.get_object_validators(instance)
+        failed = self.conditional_response(request, etag, last_modified)
+        return failed and self.set_validators(failed, etag, last_modified)
+    
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = self.get_list_validators(self.filter_queryset(self.get_queryset()))
+        response = self.conditional_response(request, etag, last_modified)
+        if response is None:
+            response = self.list_response(request, *args, **kwargs)
+        return self.set_validators(response, etag, last_modified)
+    
+    def list_response(self, request, *args, **kwargs):
+        """Build the full list response once preconditions have passed."""
+        return super().list(request, *args, **kwargs)
+    
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = self.get_object_validators(instance)
+        response = self.conditional_response(request, etag, last_modified)
+        if response is None:
+            response = Response(self.get_serializer(instance).data)
+        return self.set_validators(response, etag, last_modified)
+    
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        with transaction.atomic():
+            instance = self.get_object()
+            failed = self.check_write_preconditions(request, instance)
+            if failed is not None:
+                return failed
+            
+            serializer = self.get_serializer(instance, data=request.data, partial=partial)
+            serializer.is_valid(raise_exception=True)
+            self.perform_update(serializer)
+        
+        etag, last_modified = self.get_object_validators(serializer.instance)
+        return self.set_validators(Response(serializer.data), etag, last_modified)
+    
+    def destroy(self, request, *args, **kwargs):
+        with transaction.atomic():
+            instance = self.get_object()
+            failed = self.check_write_preconditions(request, instance)
+            if failed is not None:
+                return failed
+            
+            self.perform_destroy(instance)
+        
+        return Response(status=status.HTTP_204_NO_CONTENT)
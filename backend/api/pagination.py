@@ -0,0 +1,34 @@
+"""
+Pagination classes for the API.
+
+Large, growing collections use keyset (cursor) pagination, which seeks
+straight to the next page on an index instead of counting every row and
+skipping an offset. Clients that want numbered pages of a small collection
+can still ask for ``?page=``.
+"""
+
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class GridCursorPagination(CursorPagination):
+    """Keyset pagination over a user's grids, newest first."""
+    ordering = ('-date', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class LogCursorPagination(CursorPagination):
+    """Keyset pagination over a user's activity logs, newest first."""
+    ordering = ('-logged_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class PageNumberOptInMixin:
+    """Fall back to page-number pagination when the request has ``?page=``."""
+    
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and PageNumberPagination.page_query_param in self.request.query_params:
+            self._paginator = PageNumberPagination()
+        return super().paginator
@@ -0,0 +1,69 @@
+"""
+Fast JSON and MessagePack renderers for the API.
+"""
+
+import datetime
+import uuid
+from decimal import Decimal
+
+import msgpack
+import orjson
+from django.db.models.query import QuerySet
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def encode_default(obj):
+    """Convert values the encoders cannot handle natively, as DRF's JSON encoder does."""
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, datetime.datetime):
+        representation = obj.isoformat()
+        if representation.endswith('+00:00'):
+            representation = representation[:-6] + 'Z'
+        return representation
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, QuerySet):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, '__iter__'):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not serializable')
+
+
+class ORJSONRenderer(BaseRenderer):
+    """Render JSON with orjson."""
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Render MessagePack for clients that send ``Accept: application/msgpack``."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
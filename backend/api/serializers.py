@@ -4,12 +4,88 @@ Serializers for Box Grid Habit Tracker API.
 
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from activities.grid import MAX_ACTIVITY_ID
+from activities.importer import IMPORT_FORMATS, guess_format
 from activities.models import Activity, ActivityCategory, DailyGrid, ActivityLog
 from analytics.models import UserAnalytics, ActivityPattern, WeeklyReport
 
 User = get_user_model()
 
 
+def split_field_names(value):
+    """Split ``"a,b.c"`` into ``({"a", "b"}, {"b": ["c"]})``."""
+    names, nested = set(), {}
+    for part in value.split(','):
+        head, _, rest = part.strip().partition('.')
+        if not head:
+            continue
+        names.add(head)
+        if rest:
+            nested.setdefault(head, []).append(rest)
+    return names, nested
+
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets and a lean payload mode driven by query parameters.
+    
+    ``?fields=id,date`` keeps only the listed fields, so properties behind the
+    others are never computed. Relations in ``expandable_fields`` are nested
+    by default; once ``?expand=`` is given, only the relations it names are
+    nested and the rest are rendered as ids. Dotted names such as
+    ``activity.name`` or ``activity.category`` reach into nested serializers.
+    """
+    expandable_fields = ()
+    
+    @staticmethod
+    def wants_nested(request, name):
+        """Return whether a request asks for relation ``name`` as a nested object."""
+        fields = request.query_params.get('fields')
+        expand = request.query_params.get('expand')
+        if fields is not None and name not in split_field_names(fields)[0]:
+            return False
+        return expand is None or name in split_field_names(expand)[0]
+    
+    def _selection(self):
+        """Return the ``(fields, expand)`` strings that apply to this serializer."""
+        node, parent = self, self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            node, parent = parent, parent.parent
+        
+        if parent is None:
+            request = self.context.get('request')
+            if request is None:
+                return None, None
+            return request.query_params.get('fields'), request.query_params.get('expand')
+        if not isinstance(parent, DynamicFieldsMixin):
+            return None, None
+        
+        fields, expand = parent._selection()
+        if fields is not None:
+            fields = ','.join(split_field_names(fields)[1].get(node.field_name, [])) or None
+        if expand is not None:
+            expand = ','.join(split_field_names(expand)[1].get(node.field_name, []))
+        return fields, expand
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        requested, expand = self._selection()
+        
+        if expand is not None:
+            expanded = split_field_names(expand)[0]
+            for name in self.expandable_fields:
+                if name in fields and name not in expanded:
+                    fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+        
+        # Writes validate every field; the selection only trims what is read
+        if requested is not None and not hasattr(self, 'initial_data'):
+            keep = split_field_names(requested)[0]
+            for name in list(fields):
+                if name not in keep and not fields[name].write_only:
+                    del fields[name]
+        return fields
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for User model."""
     
@@ -47,7 +123,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         return user
 
 
-class ActivityCategorySerializer(serializers.ModelSerializer):
+class ActivityCategorySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for ActivityCategory model."""
     
     class Meta:
@@ -56,8 +132,9 @@ class ActivityCategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class ActivitySerializer(serializers.ModelSerializer):
+class ActivitySerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for Activity model."""
+    expandable_fields = ('category',)
     category = ActivityCategorySerializer(read_only=True)
     category_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
     completion_rate = serializers.ReadOnlyField()
@@ -95,8 +172,9 @@ class ActivitySerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
 
 
-class ActivityLogSerializer(serializers.ModelSerializer):
+class ActivityLogSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for ActivityLog model."""
+    expandable_fields = ('activity',)
     activity = ActivitySerializer(read_only=True)
     activity_id = serializers.IntegerField(write_only=True)
     
@@ -109,9 +187,39 @@ class ActivityLogSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'logged_at']
 
 
-class DailyGridSerializer(serializers.ModelSerializer):
+class GridCellsField(serializers.Field):
+    """Represent ``GridCells`` as a ``{"position": activity_id}`` mapping."""
+    default_error_messages = {
+        'not_a_dict': 'Expected a mapping of positions to activity IDs.',
+        'invalid_cell': 'Positions must be non-negative integers and activity IDs positive integers.',
+        'activity_id_too_large': 'Activity IDs above {max_id} cannot be stored in a grid.',
+    }
+    
+    def to_representation(self, value):
+        return value.to_dict()
+    
+    def to_internal_value(self, data):
+        # The grid size may change in the same request, so the serializer
+        # builds the GridCells once it is known
+        if not isinstance(data, dict):
+            self.fail('not_a_dict')
+        mapping = {}
+        for position, activity_id in data.items():
+            try:
+                position, activity_id = int(position), int(activity_id)
+            except (TypeError, ValueError):
+                self.fail('invalid_cell')
+            if position < 0 or activity_id <= 0:
+                self.fail('invalid_cell')
+            if activity_id > MAX_ACTIVITY_ID:
+                self.fail('activity_id_too_large', max_id=MAX_ACTIVITY_ID)
+            mapping[position] = activity_id
+        return mapping
+
+
+class DailyGridSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for DailyGrid model."""
-    activities_logged = serializers.JSONField(read_only=True)
+    activities_logged = GridCellsField(source='cells', required=False)
     completion_percentage = serializers.ReadOnlyField()
     grid_dimensions = serializers.ReadOnlyField()
     
@@ -123,6 +231,34 @@ class DailyGridSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def validate(self, attrs):
+        from activities.grid import GridCells
+        
+        mapping = attrs.get('cells')
+        if mapping is None:
+            return attrs
+        
+        if 'grid_size' in attrs:
+            grid_size = attrs['grid_size']
+        elif self.instance is not None:
+            grid_size = self.instance.grid_size
+        else:
+            grid_size = DailyGrid._meta.get_field('grid_size').get_default()
+        if any(position >= grid_size for position in mapping):
+            raise serializers.ValidationError({
+                'activities_logged': [f"Positions must be less than {grid_size}"]
+            })
+        
+        activity_ids = set(mapping.values())
+        user = self.context['request'].user
+        if Activity.objects.filter(user=user, id__in=activity_ids).count() < len(activity_ids):
+            raise serializers.ValidationError({
+                'activities_logged': ['Invalid activity ID']
+            })
+        
+        attrs['cells'] = GridCells.from_dict(mapping, grid_size)
+        return attrs
 
 
 class GridLogActivitySerializer(serializers.Serializer):
@@ -146,8 +282,64 @@ class GridLogActivitySerializer(serializers.Serializer):
         return value
 
 
+class GridBatchTapSerializer(serializers.Serializer):
+    """Serializer for one tap in a batch log request."""
+    date = serializers.DateField()
+    activity_id = serializers.IntegerField()
+    position = serializers.IntegerField(min_value=0)
+
+
+class GridBatchLogSerializer(serializers.Serializer):
+    """Serializer for logging many taps across one or more dates."""
+    taps = GridBatchTapSerializer(many=True, allow_empty=False, max_length=500)
+
+
+class SyncLogSerializer(serializers.ModelSerializer):
+    """Flat serializer for logs in a delta sync response."""
+    
+    class Meta:
+        model = ActivityLog
+        fields = [
+            'id', 'activity_id', 'date', 'grid_position', 'notes',
+            'logged_at', 'idempotency_key'
+        ]
+
+
+class SyncTapSerializer(GridBatchTapSerializer):
+    """Serializer for one offline tap, keyed so uploads can be retried."""
+    idempotency_key = serializers.CharField(max_length=64)
+
+
+class SyncUploadSerializer(serializers.Serializer):
+    """Serializer for an offline client's tap upload."""
+    cursor = serializers.IntegerField(min_value=0, default=0)
+    taps = SyncTapSerializer(many=True, max_length=500, default=list)
+
+
+class ExportRequestSerializer(serializers.Serializer):
+    """Serializer for choosing what a history export contains."""
+    kind = serializers.ChoiceField(choices=['logs', 'grids'], default='logs')
+    output = serializers.ChoiceField(choices=['csv', 'ndjson'], default='csv')
+
+
+class ImportUploadSerializer(serializers.Serializer):
+    """Serializer for a history file upload; the format defaults to the file extension."""
+    file = serializers.FileField()
+    file_format = serializers.ChoiceField(choices=IMPORT_FORMATS, required=False)
+    
+    def validate(self, attrs):
+        if 'file_format' not in attrs:
+            attrs['file_format'] = guess_format(attrs['file'].name)
+            if attrs['file_format'] is None:
+                raise serializers.ValidationError({
+                    'file_format': ['Could not tell the format from the file name']
+                })
+        return attrs
+
+
 class UserAnalyticsSerializer(serializers.ModelSerializer):
     """Serializer for UserAnalytics model."""
+    current_streak = serializers.IntegerField(source='active_streak', read_only=True)
     
     class Meta:
         model = UserAnalytics
@@ -205,12 +397,23 @@ class CompletionRateSerializer(serializers.Serializer):
 
 class PatternInsightSerializer(serializers.Serializer):
     """Serializer for pattern insights."""
+    activity_id = serializers.IntegerField()
+    activity_name = serializers.CharField()
     pattern_type = serializers.CharField()
     pattern_data = serializers.JSONField()
     confidence_score = serializers.FloatField()
     description = serializers.CharField()
 
 
+class HeatmapSerializer(serializers.Serializer):
+    """Serializer for a year of daily completion intensities."""
+    year = serializers.IntegerField()
+    start_date = serializers.DateField()
+    days = serializers.IntegerField()
+    encoding = serializers.CharField()
+    intensities = serializers.JSONField()
+
+
 class GridRangeSerializer(serializers.Serializer):
     """Serializer for grid range data."""
     start_date = serializers.DateField()
@@ -0,0 +1,32 @@
+"""
+Signal handlers that invalidate cached API responses.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from activities.models import Activity, ActivityLog, DailyGrid
+from activities.signals import (
+    activity_logs_bulk_created, activity_logs_bulk_deleted, history_imported, is_bulk_delete
+)
+from . import cache as response_cache
+
+
+def invalidate_user_responses(sender, instance, raw=False, origin=None, **kwargs):
+    """Bump the owning user's cache version when their data changes."""
+    if raw or (sender is ActivityLog and is_bulk_delete(instance, origin)):
+        return
+    response_cache.bump_version(instance.user_id)
+
+
+for model in (Activity, DailyGrid, ActivityLog):
+    post_save.connect(invalidate_user_responses, sender=model, dispatch_uid=f'api-cache-save-{model.__name__}')
+    post_delete.connect(invalidate_user_responses, sender=model, dispatch_uid=f'api-cache-delete-{model.__name__}')
+
+
+@receiver(activity_logs_bulk_created)
+@receiver(activity_logs_bulk_deleted)
+@receiver(history_imported)
+def invalidate_bulk_log_responses(sender, user_id, **kwargs):
+    """Bump the user's cache version after bulk writes, bulk deletes or an import."""
+    response_cache.bump_version(user_id)
@@ -0,0 +1,139 @@
+"""
+Tests for the API.
+"""
+
+import re
+from datetime import date, timedelta
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.settings import api_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from activities.models import Activity, ActivityLog, DailyGrid, SyncChange
+from analytics.models import DailyActivityRollup
+from .views import ActivityViewSet, DailyGridViewSet
+
+User = get_user_model()
+
+
+@override_settings(API_RESPONSE_CACHE_ENABLED=False)
+class ListQueryCountTests(TestCase):
+    """
+    List endpoints run the same number of queries for one row as for a full
+    page, so per-row properties never fall back to a query each.
+    """
+
+    # Activities: the newest sync change for the list validators, the page
+    # count and the page itself, with category, log counts and day bitmaps
+    # joined or annotated onto it
+    ACTIVITY_LIST_QUERIES = 3
+    # Grids: the newest sync change for the list validators and the page
+    GRID_LIST_QUERIES = 2
+
+    def setUp(self):
+        self.user = User.objects.create_user('lists', password='unused')
+
+    def seed(self, first, last):
+        """Create activities and grids ``first`` to ``last`` with a log in each."""
+        today = date.today()
+        activities = [
+            Activity.objects.create(user=self.user, name=f'Activity {index}')
+            for index in range(first, last)
+        ]
+        DailyGrid.log_activities(self.user, [
+            {'date': today - timedelta(days=index), 'activity_id': activity.id, 'position': 0}
+            for index, activity in zip(range(first, last), activities)
+        ])
+
+    def assert_list_queries(self, viewset, expected, rows):
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user=self.user)
+        with self.assertNumQueries(expected):
+            response = viewset.as_view({'get': 'list'})(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), rows)
+
+    def test_activity_list_queries_do_not_grow_with_page_size(self):
+        page_size = api_settings.PAGE_SIZE
+        self.seed(0, 1)
+        self.assert_list_queries(ActivityViewSet, self.ACTIVITY_LIST_QUERIES, 1)
+        self.seed(1, page_size + 1)
+        self.assert_list_queries(ActivityViewSet, self.ACTIVITY_LIST_QUERIES, page_size)
+
+    def test_grid_list_queries_do_not_grow_with_page_size(self):
+        page_size = api_settings.PAGE_SIZE
+        self.seed(0, 1)
+        self.assert_list_queries(DailyGridViewSet, self.GRID_LIST_QUERIES, 1)
+        self.seed(1, page_size + 1)
+        self.assert_list_queries(DailyGridViewSet, self.GRID_LIST_QUERIES, page_size)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Query plans are only checked on PostgreSQL')
+class QueryPlanTests(TestCase):
+    """
+    The hot activity, grid, log and rollup queries are answered from indexes.
+
+    Sequential scans are disabled for the test transaction, so any that
+    remain in a plan mean no index fits the query.
+    """
+
+    HISTORY_DAYS = 120
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = date.today()
+        # Several users, so filtering on the user is selective
+        users = [cls.seed_user(index) for index in range(3)]
+        cls.user, cls.activity = users[0]
+
+    @classmethod
+    def seed_user(cls, index):
+        """Create a user with a few activities and some months of logged grids."""
+        user = User.objects.create_user(f'plans-{index}', password='unused')
+        activities = [
+            Activity.objects.create(user=user, name=f'Activity {position}', is_active=position != 3)
+            for position in range(4)
+        ]
+        DailyGrid.log_activities(user, [
+            {'date': cls.today - timedelta(days=day), 'activity_id': activity.id, 'position': position}
+            for day in range(cls.HISTORY_DAYS)
+            for position, activity in enumerate(activities[:1 + day % 3])
+        ])
+        return user, activities[0]
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('ANALYZE')
+
+    def hot_queries(self):
+        """Return ``(label, queryset)`` for the query shapes the API runs most."""
+        user, activity, today = self.user, self.activity, self.today
+        month_ago = today - timedelta(days=30)
+        return [
+            ('logs by user and date', ActivityLog.objects.filter(user=user, date__in=[today])),
+            ('logs by user and date range', ActivityLog.objects.filter(user=user, date__range=(month_ago, today))),
+            ('logs by activity and date', ActivityLog.objects.filter(activity=activity, date__gte=month_ago)),
+            ('log cursor page', ActivityLog.objects.filter(user=user).order_by('-logged_at', '-id')[:20]),
+            ('log export', ActivityLog.objects.filter(user=user).order_by('date', 'id')),
+            ('active activities', Activity.objects.filter(user=user, is_active=True)),
+            ('activities with log counts', Activity.objects.filter(user=user, is_active=True).with_log_counts()),
+            ('grids by date range', DailyGrid.objects.filter(user=user, date__range=(month_ago, today))),
+            ('grid cursor page', DailyGrid.objects.filter(user=user).order_by('-date', '-id')[:20]),
+            ('rollups by date range', DailyActivityRollup.objects.filter(user=user, date__range=(month_ago, today))),
+            (
+                'rollup streak dates',
+                DailyActivityRollup.objects.filter(user=user).order_by('date').values_list('date', flat=True).distinct()
+            ),
+            ('sync changes', SyncChange.objects.filter(user=user, id__gt=0).order_by('id')[:500]),
+        ]
+
+    def test_hot_queries_use_indexes(self):
+        for label, queryset in self.hot_queries():
+            with self.subTest(query=label):
+                plan = queryset.explain()
+                scans = [line.strip() for line in plan.splitlines() if re.search(r'\bSeq Scan\b', line)]
+                self.assertEqual(scans, [], plan)
\ No newline at end of file
@@ -7,7 +7,8 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     AuthViewSet, ActivityViewSet, ActivityCategoryViewSet,
     DailyGridViewSet, ActivityLogViewSet, AnalyticsViewSet,
-    HealthCheckView, UserProfileViewSet
+    HealthCheckView, UserProfileViewSet, SyncViewSet, ExportViewSet,
+    ImportViewSet
 )
 
 # Create router and register viewsets
@@ -19,6 +20,9 @@ router.register(r'grids', DailyGridViewSet, basename='grid')
 router.register(r'logs', ActivityLogViewSet, basename='log')
 router.register(r'analytics', AnalyticsViewSet, basename='analytics')
 router.register(r'profile', UserProfileViewSet, basename='profile')
+router.register(r'sync', SyncViewSet, basename='sync')
+router.register(r'export', ExportViewSet, basename='export')
+router.register(r'import', ImportViewSet, basename='import')
 
 urlpatterns = [
     # Include router URLs
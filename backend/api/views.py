@@ -2,24 +2,57 @@
 API views for Box Grid Habit Tracker.
 """
 
+import json
+import uuid
+
+from celery.result import AsyncResult
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from django.conf import settings
+from django.core.files.storage import default_storage
 from django.contrib.auth import authenticate, login, logout
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Avg, F, FloatField, Prefetch, Sum, Value, Window
+from django.db.models.functions import Least
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from datetime import date, timedelta
+from datetime import date, datetime, time, timedelta
 
+from . import cache as response_cache
+from .mixins import ConditionalMixin
+from .pagination import GridCursorPagination, LogCursorPagination, PageNumberOptInMixin
 from .serializers import (
     UserSerializer, UserRegistrationSerializer, ActivitySerializer,
     ActivityCategorySerializer, DailyGridSerializer, ActivityLogSerializer,
-    GridLogActivitySerializer, UserAnalyticsSerializer, ActivityPatternSerializer,
-    WeeklyReportSerializer, StreakAnalyticsSerializer, CompletionRateSerializer,
-    PatternInsightSerializer, GridRangeSerializer
+    GridLogActivitySerializer, GridBatchLogSerializer, UserAnalyticsSerializer,
+    ActivityPatternSerializer, WeeklyReportSerializer, StreakAnalyticsSerializer, CompletionRateSerializer,
+    PatternInsightSerializer, GridRangeSerializer, HeatmapSerializer,
+    SyncLogSerializer, SyncUploadSerializer, ExportRequestSerializer,
+    ImportUploadSerializer
 )
-from activities.models import Activity, ActivityCategory, DailyGrid, ActivityLog
-from analytics.models import UserAnalytics, ActivityPattern, WeeklyReport
+from activities import export, write_behind
+from activities.models import Activity, ActivityCategory, DailyGrid, ActivityLog, SyncChange
+from activities.streaks import get_streaks_by_activity
+from activities.sync import changes_since
+from activities.tasks import export_history, import_history
+from analytics.models import DailyActivityRollup, UserAnalytics, ActivityPattern, WeeklyReport
+from analytics import heatmap
+from analytics.patterns import describe_pattern
+
+
+def latest_change(user):
+    """Return ``(id, created_at)`` of the user's newest sync change, or ``(0, None)``."""
+    latest = (
+        SyncChange.objects.filter(user=user)
+        .order_by('-id')
+        .values_list('id', 'created_at')
+        .first()
+    )
+    return latest or (0, None)
 
 
 class AuthViewSet(viewsets.ViewSet):
@@ -68,24 +101,55 @@ class AuthViewSet(viewsets.ViewSet):
         return Response({'message': 'Logout successful'})
 
 
-class ActivityViewSet(viewsets.ModelViewSet):
+class ActivityViewSet(ConditionalMixin, viewsets.ModelViewSet):
     """Activity management endpoints."""
     
     serializer_class = ActivitySerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Activity.objects.filter(user=self.request.user, is_active=True)
+        # Metrics come from annotations so a page costs the same queries at any size
+        return (
+            Activity.objects.filter(user=self.request.user, is_active=True)
+            .select_related('category')
+            .with_log_counts()
+            .with_day_bitmaps()
+            .order_by('-created_at', 'id')
+        )
+    
+    def get_version_parts(self):
+        # Completion rates and streaks move with every log and with the date
+        today = date.today()
+        change_id, changed_at = latest_change(self.request.user)
+        today_start = timezone.make_aware(datetime.combine(today, time.min))
+        return (change_id, today), max(changed_at or today_start, today_start)
+    
+    def get_list_validators(self, queryset):
+        # The version parts already move with every change to the list
+        return self._validators((self.request.get_full_path(),), None)
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
+    def list_response(self, request, *args, **kwargs):
+        build = super().list_response
+        # Completion rates and streaks depend on the date as well as the data
+        variant = f'{date.today()}:{request.get_full_path()}'
+        return Response(response_cache.get_or_build(
+            request.user.id, 'activities', variant,
+            lambda: build(request, *args, **kwargs).data
+        ))
+    
     @action(detail=True, methods=['post'])
     def toggle_active(self, request, pk=None):
         """Toggle activity active status."""
         activity = self.get_object()
-        activity.is_active = not activity.is_active
-        activity.save()
+        with transaction.atomic():
+            failed = self.check_write_preconditions(request, activity)
+            if failed is not None:
+                return failed
+            activity.is_active = not activity.is_active
+            activity.save()
         return Response({
             'message': f'Activity {"activated" if activity.is_active else "deactivated"}',
             'is_active': activity.is_active
@@ -99,18 +163,57 @@ class ActivityViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class DailyGridViewSet(viewsets.ModelViewSet):
+class DailyGridViewSet(PageNumberOptInMixin, ConditionalMixin, viewsets.ModelViewSet):
     """Daily grid management endpoints."""
     
     serializer_class = DailyGridSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = GridCursorPagination
+    ordering = GridCursorPagination.ordering
+    ordering_fields = ['date', 'id']
     
     def get_queryset(self):
         return DailyGrid.objects.filter(user=self.request.user)
     
+    def get_version_parts(self):
+        # Buffered taps are merged into reads before they reach the grid row
+        if write_behind.is_enabled():
+            return (write_behind.stream_version(self.request.user.id),), None
+        return (), None
+    
+    def get_list_validators(self, queryset):
+        # Every grid write lands in the sync feed, so its newest entry versions
+        # the list without counting the user's grids
+        change_id, changed_at = latest_change(self.request.user)
+        return self._validators((self.request.get_full_path(), change_id), changed_at)
+    
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
     
+    def get_serializer(self, *args, **kwargs):
+        if args and 'data' not in kwargs and write_behind.is_enabled():
+            # Show the user their own taps that are still waiting to be flushed
+            grids = [args[0]] if isinstance(args[0], DailyGrid) else list(args[0])
+            write_behind.merge_pending(self.request.user.id, grids)
+        return super().get_serializer(*args, **kwargs)
+    
+    @action(detail=False)
+    def today(self, request):
+        """Get today's grid, creating it on first access."""
+        today = date.today()
+        
+        def build():
+            grid, _ = DailyGrid.objects.get_or_create(
+                user=request.user,
+                date=today,
+                defaults={'grid_size': request.user.default_grid_size}
+            )
+            return self.get_serializer(grid).data
+        
+        return Response(response_cache.get_or_build(
+            request.user.id, 'today-grid', f'{today}:{request.get_full_path()}', build
+        ))
+    
     @action(detail=True, methods=['post'])
     def log_activity(self, request, pk=None):
         """Log an activity in a specific grid position."""
@@ -123,12 +226,32 @@ class DailyGridViewSet(viewsets.ModelViewSet):
             
             try:
                 activity = Activity.objects.get(id=activity_id, user=request.user, is_active=True)
-                grid.log_activity(activity, position)
+                buffered = write_behind.is_enabled()
                 
-                return Response({
-                    'message': 'Activity logged successfully',
-                    'grid': DailyGridSerializer(grid).data
-                })
+                # A buffered tap is checked against the same ETag as a direct
+                # one, which includes the stream version, and is appended while
+                # the grid row is locked so conditional taps cannot both pass
+                with transaction.atomic():
+                    failed = self.check_write_preconditions(request, grid)
+                    if failed is not None:
+                        return failed
+                    if buffered:
+                        write_behind.buffer_tap(grid, activity, position)
+                    else:
+                        grid.log_activity(activity, position)
+                
+                if buffered:
+                    response_cache.bump_version(request.user.id)
+                    response = Response({
+                        'message': 'Activity queued',
+                        'grid': self.get_serializer(grid).data
+                    }, status=status.HTTP_202_ACCEPTED)
+                else:
+                    response = Response({
+                        'message': 'Activity logged successfully',
+                        'grid': DailyGridSerializer(grid).data
+                    })
+                return self.set_validators(response, *self.get_object_validators(grid))
             except Activity.DoesNotExist:
                 return Response({
                     'error': 'Activity not found'
@@ -139,6 +262,307 @@ class DailyGridViewSet(viewsets.ModelViewSet):
                 }, status=status.HTTP_400_BAD_REQUEST)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    def grid_range(self, request, start_date=None, end_date=None):
+        """
+        Get the grids between two dates with their totals.
+        
+        One query reads the range, with the totals computed by window
+        aggregates; ranges longer than ``GRID_RANGE_STREAM_DAYS`` are
+        streamed as they are read. Taps still buffered by the write-behind
+        path are applied to each row, and to the totals, either way.
+        """
+        try:
+            start = date.fromisoformat(start_date)
+            end = date.fromisoformat(end_date)
+        except ValueError:
+            return Response({
+                'error': 'Dates must be in YYYY-MM-DD format'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        days = (end - start).days + 1
+        if days <= 0:
+            return Response({
+                'error': 'End date must not be before start date'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if days > settings.GRID_RANGE_MAX_DAYS:
+            return Response({
+                'error': f'Range must not exceed {settings.GRID_RANGE_MAX_DAYS} days'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        completion = Least(
+            Value(100.0),
+            F('filled_count') * Value(100.0) / F('grid_size'),
+            output_field=FloatField()
+        )
+        grids = (
+            self.get_queryset()
+            .filter(date__range=(start, end))
+            .order_by('date')
+            .annotate(
+                range_total=Window(Sum('filled_count')),
+                range_average=Window(Avg(completion), output_field=FloatField())
+            )
+        )
+        
+        pending = write_behind.pending_taps(request.user.id) if write_behind.is_enabled() else {}
+        
+        if days > settings.GRID_RANGE_STREAM_DAYS:
+            return StreamingHttpResponse(
+                self._stream_grid_range(start, end, grids, pending),
+                content_type='application/json'
+            )
+        
+        grids = list(grids)
+        deltas = [self._apply_pending(grid, pending) for grid in grids]
+        return Response(GridRangeSerializer({
+            'start_date': start,
+            'end_date': end,
+            'grids': grids,
+            **self._range_totals(grids[-1] if grids else None, deltas),
+        }).data)
+    
+    def _apply_pending(self, grid, pending):
+        """Apply buffered taps to a range row, returning how much they changed its fill and completion."""
+        if grid.date.isoformat() not in pending:
+            return 0, 0.0
+        filled, completion = grid.cells.filled, grid.completion_percentage
+        write_behind.apply_pending(grid, pending)
+        return grid.cells.filled - filled, grid.completion_percentage - completion
+    
+    def _range_totals(self, grid, deltas):
+        """Return the range totals from a row's window aggregates, adjusted by per-row tap deltas."""
+        if grid is None:
+            return {'total_activities': 0, 'average_completion_rate': 0.0}
+        return {
+            'total_activities': grid.range_total + sum(filled for filled, _ in deltas),
+            'average_completion_rate': grid.range_average + sum(completion for _, completion in deltas) / len(deltas),
+        }
+    
+    def _stream_grid_range(self, start, end, grids, pending):
+        """Yield a grid range as JSON, one grid at a time."""
+        yield json.dumps({'start_date': start, 'end_date': end}, cls=DjangoJSONEncoder)[:-1]
+        yield ', "grids": ['
+        
+        grid, deltas = None, []
+        for index, grid in enumerate(grids.iterator(chunk_size=500)):
+            deltas.append(self._apply_pending(grid, pending))
+            prefix = ', ' if index else ''
+            yield prefix + json.dumps(DailyGridSerializer(grid).data, cls=DjangoJSONEncoder)
+        
+        yield '], ' + json.dumps(self._range_totals(grid, deltas))[1:]
+    
+    @action(detail=False, methods=['post'])
+    def log_batch(self, request):
+        """Log many taps across one or more dates in a single request."""
+        serializer = GridBatchLogSerializer(data=request.data)
+        
+        if serializer.is_valid():
+            results, grids = DailyGrid.log_activities(
+                request.user, serializer.validated_data['taps']
+            )
+            return Response({
+                'results': results,
+                'grids': DailyGridSerializer(grids, many=True).data
+            })
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ActivityLogViewSet(PageNumberOptInMixin, viewsets.ReadOnlyModelViewSet):
+    """Read-only activity log endpoints; logs are written through the grids."""
+    
+    serializer_class = ActivityLogSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = LogCursorPagination
+    ordering = LogCursorPagination.ordering
+    ordering_fields = ['logged_at', 'date', 'id']
+    filterset_fields = ['date', 'activity']
+    
+    def get_queryset(self):
+        queryset = ActivityLog.objects.filter(user=self.request.user)
+        if not ActivityLogSerializer.wants_nested(self.request, 'activity'):
+            return queryset
+        
+        # Resolve the nested activities, with their metrics, in one extra query
+        activities = (
+            Activity.objects.select_related('category')
+            .with_log_counts()
+            .with_day_bitmaps()
+        )
+        return queryset.prefetch_related(Prefetch('activity', queryset=activities))
+
+
+class SyncViewSet(viewsets.ViewSet):
+    """Delta sync endpoints for offline clients."""
+    
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def _changes(self, request, cursor):
+        changes = changes_since(request.user, cursor)
+        changed = changes['changed']
+        return {
+            'cursor': changes['cursor'],
+            'has_more': changes['has_more'],
+            'activities': ActivitySerializer(
+                changed['activity'].select_related('category').with_log_counts().with_day_bitmaps(),
+                many=True
+            ).data,
+            'grids': DailyGridSerializer(changed['grid'], many=True).data,
+            'logs': SyncLogSerializer(changed['log'], many=True).data,
+            'deleted': {
+                'activities': changes['deleted']['activity'],
+                'grids': changes['deleted']['grid'],
+                'logs': changes['deleted']['log'],
+            },
+        }
+    
+    def list(self, request):
+        """Return everything changed since ``?cursor``."""
+        try:
+            cursor = int(request.query_params.get('cursor', 0))
+        except ValueError:
+            return Response({
+                'error': 'Invalid cursor'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(self._changes(request, max(cursor, 0)))
+    
+    def create(self, request):
+        """Apply offline taps, then return everything changed since ``cursor``."""
+        serializer = SyncUploadSerializer(data=request.data)
+        
+        if serializer.is_valid():
+            taps = serializer.validated_data['taps']
+            results = DailyGrid.log_activities(request.user, taps)[0] if taps else []
+            for tap, result in zip(taps, results):
+                result['idempotency_key'] = tap['idempotency_key']
+            
+            return Response({
+                'results': results,
+                **self._changes(request, serializer.validated_data['cursor'])
+            })
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ExportViewSet(viewsets.ViewSet):
+    """
+    Full-history exports of a user's logs and grids.
+    
+    Downloads are streamed straight from the database; large exports can
+    instead be queued and collected from storage once written.
+    """
+    
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def _download(self, request, kind):
+        serializer = ExportRequestSerializer(data={**request.query_params.dict(), 'kind': kind})
+        serializer.is_valid(raise_exception=True)
+        output = serializer.validated_data['output']
+        
+        response = StreamingHttpResponse(
+            export.export_stream(request.user, kind, output),
+            content_type=export.EXPORT_FORMATS[output]
+        )
+        filename = export.export_filename(kind, output)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    
+    @action(detail=False)
+    def logs(self, request):
+        """Stream every activity log as ``?output=csv`` or ``ndjson``."""
+        return self._download(request, 'logs')
+    
+    @action(detail=False)
+    def grids(self, request):
+        """Stream every daily grid as ``?output=csv`` or ``ndjson``."""
+        return self._download(request, 'grids')
+    
+    def create(self, request):
+        """Queue an export to be written to storage."""
+        serializer = ExportRequestSerializer(data=request.data)
+        
+        if serializer.is_valid():
+            result = export_history.delay(
+                request.user.id,
+                serializer.validated_data['kind'],
+                serializer.validated_data['output']
+            )
+            return Response({'task_id': result.id}, status=status.HTTP_202_ACCEPTED)
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    def retrieve(self, request, pk=None):
+        """Report a queued export's state, with its URL once written."""
+        result = AsyncResult(pk)
+        if result.successful():
+            name = result.result
+            prefix = export.export_storage_prefix(request.user.id)
+            if not isinstance(name, str) or not name.startswith(prefix):
+                return Response({
+                    'error': 'Export not found'
+                }, status=status.HTTP_404_NOT_FOUND)
+            return Response({'status': 'ready', 'url': default_storage.url(name)})
+        if result.failed():
+            return Response({'status': 'failed'})
+        return Response({'status': 'pending'})
+
+
+class ImportViewSet(viewsets.ViewSet):
+    """
+    History imports from other habit trackers.
+    
+    Uploads are saved to storage and imported in batches by a Celery task
+    whose progress can be polled.
+    """
+    
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @staticmethod
+    def task_id_prefix(user_id):
+        """Return the prefix of the task ids of a user's imports."""
+        return f'import-{user_id}-'
+    
+    def create(self, request):
+        """Upload a CSV, NDJSON or JSON history file and queue its import."""
+        serializer = ImportUploadSerializer(data=request.data)
+        
+        if serializer.is_valid():
+            import_format = serializer.validated_data['file_format']
+            name = default_storage.save(
+                f'imports/{request.user.id}/{uuid.uuid4().hex}.{import_format}',
+                serializer.validated_data['file']
+            )
+            # The owner is part of the task id, so polling can check it
+            # before looking at the task, whatever state it is in
+            result = import_history.apply_async(
+                (request.user.id, name, import_format),
+                task_id=f'{self.task_id_prefix(request.user.id)}{uuid.uuid4()}'
+            )
+            return Response({'task_id': result.id}, status=status.HTTP_202_ACCEPTED)
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    def retrieve(self, request, pk=None):
+        """Report a queued import's state and progress."""
+        if not pk.startswith(self.task_id_prefix(request.user.id)):
+            return Response({
+                'error': 'Import not found'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        result = AsyncResult(pk)
+        if result.failed():
+            # Failed tasks keep the exception rather than a report
+            return Response({'status': 'failed'})
+        
+        info = result.info if isinstance(result.info, dict) else {}
+        report = {key: value for key, value in info.items() if key != 'user_id'}
+        if result.successful():
+            return Response({'status': 'done', **report})
+        if result.state == 'PROGRESS':
+            return Response({'status': 'running', **report})
+        return Response({'status': 'pending'})
 
 
 class AnalyticsViewSet(viewsets.ViewSet):
@@ -150,7 +574,9 @@ class AnalyticsViewSet(viewsets.ViewSet):
     def overview(self, request):
         """Get user analytics overview."""
         analytics, created = UserAnalytics.objects.get_or_create(user=request.user)
-        analytics.update_analytics()
+        if created:
+            # Rows are maintained incrementally after the first build
+            analytics.update_analytics()
         
         serializer = UserAnalyticsSerializer(analytics)
         return Response(serializer.data)
@@ -158,15 +584,21 @@ class AnalyticsViewSet(viewsets.ViewSet):
     @action(detail=False)
     def streaks(self, request):
         """Get streak analytics for all activities."""
-        activities = Activity.objects.filter(user=request.user, is_active=True)
+        activities = Activity.objects.filter(
+            user=request.user, is_active=True
+        ).with_log_counts()
+        streaks = get_streaks_by_activity(
+            DailyActivityRollup.objects.filter(user=request.user, activity__is_active=True)
+        )
         streak_data = []
         
         for activity in activities:
+            current_streak, longest_streak = streaks.get(activity.id, (0, 0))
             streak_data.append({
                 'activity_id': activity.id,
                 'activity_name': activity.name,
-                'current_streak': activity.current_streak,
-                'longest_streak': activity.current_streak,
+                'current_streak': current_streak,
+                'longest_streak': longest_streak,
                 'completion_rate': activity.completion_rate
             })
         
@@ -176,21 +608,80 @@ class AnalyticsViewSet(viewsets.ViewSet):
     @action(detail=False)
     def completion_rates(self, request):
         """Get completion rate analytics."""
-        activities = Activity.objects.filter(user=request.user, is_active=True)
+        activities = Activity.objects.filter(
+            user=request.user, is_active=True
+        ).with_log_counts()
         completion_data = []
         
         for activity in activities:
-            total_logs = activity.activity_logs.count()
             completion_data.append({
                 'activity_id': activity.id,
                 'activity_name': activity.name,
                 'completion_rate': activity.completion_rate,
-                'total_logs': total_logs,
+                'total_logs': activity.total_log_count,
                 'target_count': activity.target_count
             })
         
         serializer = CompletionRateSerializer(completion_data, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False)
+    def heatmap(self, request):
+        """Get a year of daily completion intensities for a GitHub-style heat map."""
+        try:
+            year = int(request.query_params.get('year', date.today().year))
+        except ValueError:
+            return Response({
+                'error': 'Year must be an integer'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        encoding = request.query_params.get('encoding', 'list')
+        if encoding not in heatmap.ENCODINGS:
+            return Response({
+                'error': f'Encoding must be one of: {", ".join(heatmap.ENCODINGS)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not date.min.year < year < date.max.year:
+            return Response({
+                'error': 'Year is out of range'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        intensities = heatmap.get_year(request.user.id, year)
+        serializer = HeatmapSerializer({
+            'year': year,
+            'start_date': date(year, 1, 1),
+            'days': len(intensities),
+            'encoding': encoding,
+            'intensities': heatmap.encode(intensities, encoding),
+        })
+        return Response(serializer.data)
+    
+    @action(detail=False)
+    def patterns(self, request):
+        """Get mined activity patterns, most confident first."""
+        patterns = ActivityPattern.objects.filter(
+            user=request.user,
+            activity__is_active=True
+        ).select_related('activity')
+        
+        pattern_type = request.query_params.get('type')
+        if pattern_type:
+            patterns = patterns.filter(pattern_type=pattern_type)
+        
+        pattern_data = [
+            {
+                'activity_id': pattern.activity_id,
+                'activity_name': pattern.activity.name,
+                'pattern_type': pattern.pattern_type,
+                'pattern_data': pattern.pattern_data,
+                'confidence_score': pattern.confidence_score,
+                'description': describe_pattern(pattern),
+            }
+            for pattern in patterns
+        ]
+        
+        serializer = PatternInsightSerializer(pattern_data, many=True)
+        return Response(serializer.data)
 
 
 class HealthCheckView(APIView):
@@ -4,6 +4,7 @@ Celery configuration for Box Grid Habit Tracker project.
 
 import os
 from celery import Celery
+from celery.schedules import crontab
 
 # Set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
@@ -17,6 +18,25 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
+# Periodic tasks. Weekly reports are queued once a week, at 12:15 UTC on
+# Monday: by then the week has finished in every timezone (UTC-12 is the
+# last), and even UTC+14 is still inside the following week.
+app.conf.beat_schedule = {
+    'schedule-weekly-reports': {
+        'task': 'analytics.tasks.schedule_weekly_reports',
+        'schedule': crontab(minute=15, hour=12, day_of_week='mon'),
+    },
+    'schedule-pattern-mining': {
+        'task': 'analytics.tasks.schedule_pattern_mining',
+        'schedule': crontab(minute=30, hour=3),
+    },
+    # A no-op unless GRID_WRITE_BEHIND is on
+    'flush-grid-taps': {
+        'task': 'activities.tasks.flush_grid_taps',
+        'schedule': 5.0,
+    },
+}
+
 
 @app.task(bind=True)
 def debug_task(self):
@@ -0,0 +1,46 @@
+"""
+Token-owned Redis locks for background tasks.
+
+A lock stores the token of the worker that took it and is only renewed or
+released while that token still holds it, so a worker whose lock expired
+cannot free a lock another worker has taken since.
+"""
+
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+@lru_cache(maxsize=None)
+def get_client():
+    """Return a shared Redis client for locks."""
+    return redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+
+def acquire(key, token, timeout):
+    """Take a lock for ``timeout`` seconds, returning whether it was free."""
+    return bool(get_client().set(key, token, nx=True, ex=timeout))
+
+
+def renew(key, token, timeout):
+    """Extend a lock, returning False if it expired and was lost."""
+    return bool(get_client().eval(RENEW_SCRIPT, 1, key, token, timeout))
+
+
+def release(key, token):
+    """Release a lock if ``token`` still holds it."""
+    get_client().eval(RELEASE_SCRIPT, 1, key, token)
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""
+Project-wide middleware.
+"""
+
+import re
+
+import brotli
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+# Only the API's own data formats. HTML pages such as the admin and the
+# browsable API carry CSRF tokens, and compressing them would expose those
+# to BREACH without Django's gzip filename padding
+COMPRESSIBLE_TYPES = re.compile(r'^application/(json|x-ndjson|msgpack)\s*(;|$)')
+
+ACCEPT_ENCODING_TOKEN = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*(?:,|$)')
+
+
+def accepted_encodings(header):
+    """Return the encodings an Accept-Encoding header allows."""
+    return {
+        coding.lower()
+        for coding, quality in ACCEPT_ENCODING_TOKEN.findall(header)
+        if not quality or float(quality) > 0
+    }
+
+
+def compress_brotli_sequence(sequence):
+    """Yield a brotli stream for an iterable of byte strings."""
+    compressor = brotli.Compressor(quality=settings.RESPONSE_BROTLI_QUALITY)
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress JSON, NDJSON and MessagePack API responses with brotli or gzip.
+    
+    Brotli is preferred when the client accepts it and bodies under
+    ``RESPONSE_COMPRESSION_MIN_BYTES`` are sent as they are. Other content
+    types, and async streaming responses, are passed through unchanged.
+    """
+    
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        if response.streaming and response.is_async:
+            return response
+        if not COMPRESSIBLE_TYPES.match(response.get('Content-Type', '')):
+            return response
+        if not response.streaming and len(response.content) < settings.RESPONSE_COMPRESSION_MIN_BYTES:
+            return response
+        
+        patch_vary_headers(response, ('Accept-Encoding',))
+        
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if 'br' in accepted:
+            encoding = 'br'
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+        else:
+            return response
+        
+        if response.streaming:
+            if encoding == 'br':
+                response.streaming_content = compress_brotli_sequence(response.streaming_content)
+            else:
+                response.streaming_content = compress_sequence(response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            if encoding == 'br':
+                compressed = brotli.compress(response.content, quality=settings.RESPONSE_BROTLI_QUALITY)
+            else:
+                compressed = compress_string(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+        
+        # The compressed bytes differ, so a strong ETag must become weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -4,6 +4,7 @@ Django settings for Box Grid Habit Tracker project.
 
 import os
 from pathlib import Path
+from corsheaders.defaults import default_headers
 from decouple import config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.CompressionMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -132,6 +134,17 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'api.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'api.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
@@ -141,6 +154,10 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Responses smaller than this are not worth compressing
+RESPONSE_COMPRESSION_MIN_BYTES = config('RESPONSE_COMPRESSION_MIN_BYTES', default=1024, cast=int)
+RESPONSE_BROTLI_QUALITY = config('RESPONSE_BROTLI_QUALITY', default=4, cast=int)
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -151,6 +168,10 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Let the frontend send and read conditional request headers
+CORS_ALLOW_HEADERS = [*default_headers, 'if-match', 'if-none-match']
+CORS_EXPOSE_HEADERS = ['ETag', 'Last-Modified']
+
 # Redis and Celery settings
 REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
 
@@ -161,6 +182,21 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Weekly report fan-out
+WEEKLY_REPORT_CHUNK_SIZE = config('WEEKLY_REPORT_CHUNK_SIZE', default=500, cast=int)
+WEEKLY_REPORT_MAX_CONCURRENCY = config('WEEKLY_REPORT_MAX_CONCURRENCY', default=4, cast=int)
+WEEKLY_REPORT_SLOT_TIMEOUT = config('WEEKLY_REPORT_SLOT_TIMEOUT', default=900, cast=int)
+WEEKLY_REPORT_RETRY_DELAY = config('WEEKLY_REPORT_RETRY_DELAY', default=30, cast=int)
+
+# Pattern mining
+PATTERN_MINING_CHUNK_SIZE = config('PATTERN_MINING_CHUNK_SIZE', default=200, cast=int)
+
+# Grid tap write-behind buffer in Redis, flushed by the flush_grid_taps task
+GRID_WRITE_BEHIND = config('GRID_WRITE_BEHIND', default=False, cast=bool)
+GRID_WRITE_BEHIND_BATCH_SIZE = config('GRID_WRITE_BEHIND_BATCH_SIZE', default=500, cast=int)
+GRID_WRITE_BEHIND_CLAIM_IDLE = config('GRID_WRITE_BEHIND_CLAIM_IDLE', default=60, cast=int)
+GRID_WRITE_BEHIND_MAX_DELIVERIES = config('GRID_WRITE_BEHIND_MAX_DELIVERIES', default=5, cast=int)
+
 # Cache settings
 CACHES = {
     'default': {
@@ -169,6 +205,27 @@ CACHES = {
     }
 }
 
+# Per-user cache of serialized API responses, invalidated by version bumps
+API_RESPONSE_CACHE_ENABLED = config('API_RESPONSE_CACHE_ENABLED', default=True, cast=bool)
+API_RESPONSE_CACHE_TIMEOUT = config('API_RESPONSE_CACHE_TIMEOUT', default=300, cast=int)
+
+# Heatmap years are versioned and orphaned on grid writes, so they can live long
+HEATMAP_CACHE_TIMEOUT = config('HEATMAP_CACHE_TIMEOUT', default=7 * 24 * 60 * 60, cast=int)
+
+# Delta sync page size, and how long a gap in change ids may still be filled
+SYNC_PAGE_SIZE = config('SYNC_PAGE_SIZE', default=500, cast=int)
+SYNC_SETTLE_SECONDS = config('SYNC_SETTLE_SECONDS', default=5, cast=int)
+
+# Longest grid range a client may request, and the length from which it is streamed
+GRID_RANGE_MAX_DAYS = config('GRID_RANGE_MAX_DAYS', default=3660, cast=int)
+GRID_RANGE_STREAM_DAYS = config('GRID_RANGE_STREAM_DAYS', default=366, cast=int)
+
+# Rows fetched per database round trip when streaming history exports
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Check-ins written per transaction by history imports
+IMPORT_BATCH_SIZE = config('IMPORT_BATCH_SIZE', default=2000, cast=int)
+
 # Session settings
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 SESSION_CACHE_ALIAS = 'default'
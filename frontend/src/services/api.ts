@@ -61,9 +61,12 @@ export const activitiesAPI = {
 // Grid API
 export const gridAPI = {
   getByDate: (date: string) => api.get(`/grids/${date}/`),
+  getToday: () => api.get('/grids/today/'),
   create: (gridData: any) => api.post('/grids/', gridData),
   logActivity: (gridId: number, data: { activity_id: number; position: number }) =>
     api.post(`/grids/${gridId}/log_activity/`, data),
+  logBatch: (taps: { date: string; activity_id: number; position: number }[]) =>
+    api.post('/grids/log_batch/', { taps }),
   getRange: (startDate: string, endDate: string) =>
     api.get(`/grids/range/${startDate}/${endDate}/`),
 };
@@ -74,6 +77,8 @@ export const analyticsAPI = {
   getStreaks: () => api.get('/analytics/streaks/'),
   getCompletionRates: () => api.get('/analytics/completion_rates/'),
   getPatterns: () => api.get('/analytics/patterns/'),
+  getHeatmap: (year: number, encoding: 'list' | 'base64' | 'rle' = 'list') =>
+    api.get('/analytics/heatmap/', { params: { year, encoding } }),
   getWeeklyReport: () => api.get('/analytics/weekly_report/'),
 };
 
@@ -83,4 +88,35 @@ export const profileAPI = {
   update: (userData: any) => api.put('/profile/', userData),
 };
 
+// Sync API
+export const syncAPI = {
+  pull: (cursor: number) => api.get('/sync/', { params: { cursor } }),
+  push: (
+    cursor: number,
+    taps: { idempotency_key: string; date: string; activity_id: number; position: number }[]
+  ) => api.post('/sync/', { cursor, taps }),
+};
+
+// Export API
+export const exportAPI = {
+  download: (kind: 'logs' | 'grids', output: 'csv' | 'ndjson' = 'csv') =>
+    api.get(`/export/${kind}/`, { params: { output }, responseType: 'blob' }),
+  queue: (kind: 'logs' | 'grids', output: 'csv' | 'ndjson' = 'csv') =>
+    api.post('/export/', { kind, output }),
+  getStatus: (taskId: string) => api.get(`/export/${taskId}/`),
+};
+
+// Import API
+export const importAPI = {
+  upload: (file: File, fileFormat?: 'csv' | 'ndjson' | 'json') => {
+    const data = new FormData();
+    data.append('file', file);
+    if (fileFormat) {
+      data.append('file_format', fileFormat);
+    }
+    return api.post('/import/', data);
+  },
+  getStatus: (taskId: string) => api.get(`/import/${taskId}/`),
+};
+
 export default api; 
\ No newline at end of file